@@ -1,5 +1,6 @@
 from enum import IntEnum
 from typing import Literal
+from contextvars import ContextVar
 import ragtime
 import logging
 import logging.config
@@ -75,11 +76,28 @@ DEFAULT_LITELLM_TEMP: int = (
 DEFAULT_MAX_TOKENS: int = (
     DEFAULT_MAX_TOKENS if "DEFAULT_MAX_TOKENS" in globals() else None
 )
+DEFAULT_LLM_CACHE_PATH: Path = (
+    DEFAULT_LLM_CACHE_PATH if "DEFAULT_LLM_CACHE_PATH" in globals() else None
+)
+DEFAULT_MAX_CONCURRENCY: int = (
+    DEFAULT_MAX_CONCURRENCY if "DEFAULT_MAX_CONCURRENCY" in globals() else None
+)
 
 
 # Logging - class to add msg
+# The prefix is stored in a context variable so that concurrent asyncio tasks (one per QA, one per LLM...)
+# each have their own prefix instead of overwriting each other's
+_logger_prefix: ContextVar[str] = ContextVar("ragtime_logger_prefix", default="")
+
+
 class RagtimeLogger(logging.LoggerAdapter):
-    prefix: str = ""
+    @property
+    def prefix(self) -> str:
+        return _logger_prefix.get()
+
+    @prefix.setter
+    def prefix(self, value: str):
+        _logger_prefix.set(value)
 
     def process(self, msg, kwargs):
         return f'{self.prefix + " " if self.prefix else ""}{msg}', kwargs
@@ -100,7 +118,7 @@ def init(root_folder: Path):
     global DEFAULT_SPREADSHEET_TEMPLATE, DEFAULT_WORKSHEET, DEFAULT_HEADER_SIZE, DEFAULT_QUESTION_COL, DEFAULT_FACTS_COL
     global DEFAULT_ANSWERS_COL, DEFAULT_HUMAN_EVAL_COL
     # # # LLMs
-    global DEFAULT_LITELLM_RETRIES, DEFAULT_LITELLM_TEMP, DEFAULT_MAX_TOKENS
+    global DEFAULT_LITELLM_RETRIES, DEFAULT_LITELLM_TEMP, DEFAULT_MAX_TOKENS, DEFAULT_LLM_CACHE_PATH, DEFAULT_MAX_CONCURRENCY
     # Logger
     global logger
 
@@ -135,6 +153,8 @@ def init(root_folder: Path):
     DEFAULT_LITELLM_RETRIES = 3
     DEFAULT_LITELLM_TEMP = 0
     DEFAULT_MAX_TOKENS = 1000  # empirically noticed the biggest answers are 4000 characters long - and 1 token is between 4 and 5 chars - keep the largest value, i.e. 4 chars per token
+    DEFAULT_LLM_CACHE_PATH = root_folder / "cache" / "llm_cache.sqlite"
+    DEFAULT_MAX_CONCURRENCY = 20  # max number of QAs processed at the same time by a TextGenerator
 
     ####################
     # LOGGING
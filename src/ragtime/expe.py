@@ -19,26 +19,51 @@ from ragtime.config import (
     DEFAULT_HTML_TEMPLATE,
 )
 
-from collections import defaultdict
+from ragtime.expe_io import (
+    JSON_EXTENSIONS,
+    ChunkTable,
+    ExpeFileBuffer,
+    LazyItems,
+    dumps,
+    is_expe_file,
+    scan_expe,
+    split_ext,
+    open_to_write,
+    write_bytes,
+    is_sqlite_path,
+    SQLITE_EXTENSIONS,
+    read_stats,
+    write_stats,
+    question_fingerprint,
+)
+from ragtime.expe_sqlite import ExpeStore, remove_database
+from ragtime.expe_spreadsheet import convert_value, write_rows_to_sheet
+from ragtime.expe_html import get_template, page_links, page_path, write_index, write_page
+from ragtime.expe_parquet import DEFAULT_PARQUET_BATCH_SIZE, load_from_parquet, parquet_paths, save_to_parquet
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 from openpyxl import load_workbook, Workbook
 from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 
-from copy import copy
+from contextlib import nullcontext
+from copy import copy, deepcopy
+from functools import lru_cache
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, Field
-from jinja2 import Environment, FileSystemLoader
+from pydantic import BaseModel, Field, PrivateAttr
 from tabulate import tabulate
 from pathlib import Path
+import itertools
+import math
 import shutil
-import json
+import tempfile
 import re
 
 from enum import Enum, IntEnum
 from datetime import datetime
-from typing import Any, Generic, Optional, TypeVar, Union
+from typing import Any, Callable, Generic, Iterator, Optional, TypeVar, Union
 from enum import IntEnum
 
 
@@ -55,6 +80,8 @@ class LLMAnswer(RagtimeText):
     timestamp: datetime = Optional[datetime]  
     duration: Optional[float] = None  
     cost: Optional[float] = None
+    prompt_tokens: Optional[int] = None  # as returned by the provider, or counted with a local tokenizer - see meta["tokens_source"]
+    completion_tokens: Optional[int] = None
     chunks : Optional[list] = []
 
 class WithLLMAnswer(BaseModel):
@@ -116,40 +143,173 @@ class QA(RagtimeBase):
 
     def get_attr(self, path: str) -> list[Any]:
         """Returns the value within a QA object based on its path expressed as a string
-        Useful for spreadhseets export - returns None if path is not found"""
-        result: Any = self
-        b_return_None: bool = False
+        Useful for spreadhseets export - returns None if path is not found
+        The path is compiled once with compile_path - use it directly to get the same path in many QAs"""
+        return compile_path(path)(self)
+
+
+_ITER = object()  # "[i]" index in a path
+
+
+class PathAccessor:
+    """Accessor to a value within an object based on its path, e.g. 'answers[i].eval.meta["precision"]'
+    The path is parsed once - each step is an attribute name with an optional index: an int for a list, a str for a dict
+    or "[i]" to return the list of the values for every element - every "[i]" in the path gets the same value"""
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.steps: list[tuple[str, Any]] = []
         for a in path.split("."):
             if "[" in a:
                 index: Union[str, int] = a[a.find("[") + 1 : a.rfind("]")]
-                a_wo_index: str = a[: a.find("[")]
-
                 if index.isdecimal():
                     index = int(index)  # if index is an int (list index), convert it
                 elif index == "i":  # multi row
-                    result = [
-                        self.get_attr(path.replace("[i]", f"[{i}]"))
-                        for i in range(len(getattr(result, a_wo_index)))
-                    ]
-                    return result
+                    index = _ITER
                 else:  # dict (key not decimal)
                     index = index.replace('"', "").replace("'", "")  # if it is a string (dict index), remove quotes
-
-                try:
-                    result = getattr(result, a_wo_index)[index]
-                except:
-                    b_return_None = True
+                self.steps.append((a[: a.find("[")], index))
             else:
-                try:
-                    result = getattr(result, a)
-                except:
-                    b_return_None = True
-            if b_return_None:
+                self.steps.append((a, None))
+
+    def __call__(self, obj: Any) -> Any:
+        return self._get(obj, 0, None)
+
+    def _get(self, obj: Any, start: int, i: Optional[int]) -> Any:
+        result: Any = obj
+        for num_step in range(start, len(self.steps)):
+            name, index = self.steps[num_step]
+            if index is _ITER:
+                if i is None:  # first "[i]": returns the values for every element
+                    try:
+                        nb: int = len(getattr(result, name))
+                    except Exception:
+                        return None
+                    return [self._get(result, num_step, n) for n in range(nb)]
+                index = i
+            try:
+                result = getattr(result, name)
+                if index is not None:
+                    result = result[index]
+            except Exception:
                 return None
-
         return result
 
 
+@lru_cache(maxsize=1024)
+def compile_path(path: str) -> PathAccessor:
+    """Returns the accessor to the value at path - accessors are cached"""
+    return PathAccessor(path)
+
+
+def _answer_time(llm_answer: Optional[LLMAnswer]) -> float:
+    """Timestamp of the LLMAnswer, used to keep the latest one when merging Expes"""
+    value = llm_answer.timestamp if llm_answer else None
+    return value.timestamp() if isinstance(value, datetime) else float("-inf")  # the default value is not a datetime
+
+
+def _answer_key(answer: Answer, num: int) -> str:
+    """Key of an Answer in a QA when merging - the LLM name, or its position if the Answer has no LLM"""
+    if answer.llm_answer and (answer.llm_answer.name or answer.llm_answer.full_name):
+        return answer.llm_answer.name or answer.llm_answer.full_name
+    return f"#{num}"
+
+
+def _merge_qa(qa: QA, other: QA):
+    """Merges other in qa: the answers are unioned per LLM name and the latest one is kept when both QAs have an answer
+    from the same LLM - human evals are kept - facts and chunks are kept if qa has none, otherwise the latest facts are kept"""
+    if qa.answers is None:
+        qa.answers = Answers()
+    answers: dict[str, int] = {_answer_key(a, n): n for n, a in enumerate(qa.answers)}
+    for n, answer in enumerate(other.answers or []):
+        key: str = _answer_key(answer, n)
+        if key not in answers:
+            answers[key] = len(qa.answers)
+            qa.answers.append(answer)
+            continue
+        current: Answer = qa.answers[answers[key]]
+        kept, dropped = (answer, current) if _answer_time(answer.llm_answer) > _answer_time(current.llm_answer) else (current, answer)
+        if dropped.eval and dropped.eval.human is not None and (not kept.eval or kept.eval.human is None):
+            if not kept.eval:
+                kept.eval = Eval()
+            kept.eval.human = dropped.eval.human
+        qa.answers[answers[key]] = kept
+    if other.facts and (not qa.facts or _answer_time(other.facts.llm_answer) > _answer_time(qa.facts.llm_answer)):
+        qa.facts = other.facts
+    if other.chunks and not qa.chunks:
+        qa.chunks = other.chunks
+    qa.meta = {**other.meta, **qa.meta}
+
+
+_STATS_KEYS: tuple[str, ...] = ("questions", "chunks", "facts", "answers", "human eval", "auto eval")
+_MODEL_STATS_KEYS: tuple[str, ...] = ("answers", "human eval", "auto eval")
+
+
+def _qa_stats(qa: QA) -> tuple:
+    """Contribution of a QA to the stats of its Expe: the counts of _STATS_KEYS, its number of answers and, for each
+    answer with an LLM name, the name and the counts of _MODEL_STATS_KEYS"""
+    counts: list[int] = [1 if qa.question.text else 0, sum(1 for c in qa.chunks or [] if c),
+                         sum(1 for f in qa.facts or [] if f), 0, 0, 0]
+    per_model: list[tuple] = []
+    for a in qa.answers or []:
+        answer_counts: tuple[int, int, int] = (1 if a.text else 0, 1 if a.eval and a.eval.human else 0,
+                                               1 if a.eval and a.eval.auto else 0)
+        for i, counted in enumerate(answer_counts):
+            counts[3 + i] += counted
+        if a.llm_answer and a.llm_answer.name:
+            per_model.append((a.llm_answer.name, *answer_counts))
+    return (*counts, len(qa.answers or []), tuple(per_model))
+
+
+class _ExpeStats:
+    """Stats of an Expe updated incrementally: the contribution of each QA is kept with the totals, so that only the
+    QAs which may have changed are counted again"""
+
+    def __init__(self, source: Any, qa_stats: list[tuple]):
+        self.source: Any = source  # items of the Expe when counted - the stats are computed again if they are replaced
+        self.qa_stats: list[Optional[tuple]] = []
+        self.dirty: set[int] = set()  # indexes of the QAs to count again
+        self.totals: list[int] = [0] * len(_STATS_KEYS)
+        self.nb_answers: Counter = Counter()  # number of QAs per number of answers
+        self.per_model: dict[str, list[int]] = {}  # counts of _MODEL_STATS_KEYS and number of answers per LLM name
+        for qa_stat in qa_stats:
+            self.append(qa_stat)
+
+    def _add(self, qa_stat: tuple, sign: int):
+        for i in range(len(_STATS_KEYS)):
+            self.totals[i] += sign * qa_stat[i]
+        self.nb_answers[qa_stat[-2]] += sign
+        for name, *counts in qa_stat[-1]:
+            model: list[int] = self.per_model.setdefault(name, [0] * (len(_MODEL_STATS_KEYS) + 1))
+            for i, counted in enumerate(counts):
+                model[i] += sign * counted
+            model[-1] += sign
+            if not model[-1]:
+                del self.per_model[name]
+
+    def append(self, qa_stat: Optional[tuple]):
+        """Adds the contribution of a new QA - None to count it later"""
+        self.qa_stats.append(qa_stat)
+        if qa_stat is None:
+            self.dirty.add(len(self.qa_stats) - 1)
+        else:
+            self._add(qa_stat, 1)
+
+    def update(self, index: int, qa_stat: tuple):
+        if self.qa_stats[index] is not None:
+            self._add(self.qa_stats[index], -1)
+        self.qa_stats[index] = qa_stat
+        self._add(qa_stat, 1)
+
+    def result(self) -> dict:
+        res: dict = dict(zip(_STATS_KEYS, self.totals))
+        per_model: dict[str, dict[str, int]] = {name: dict(zip(_MODEL_STATS_KEYS, model)) for name, model in self.per_model.items()}
+        # the number of models is the number of distinct LLMs, since the QAs may not all have the same answers
+        res["models"] = len(per_model) or max((n for n, nb_qas in self.nb_answers.items() if nb_qas), default=0)
+        res["per model"] = per_model
+        return res
+
+
 class UpdateTypes(IntEnum):
     human_eval = 0
     facts = 1
@@ -166,31 +326,130 @@ class StartFrom(IntEnum):
 class Expe(RagtimeList[QA]):
     meta: Optional[dict] = {}
     json_path: Path = Field(None, exclude=True)
+    _lazy_items: Optional[LazyItems] = PrivateAttr(default=None)
+    _store: Optional[ExpeStore] = PrivateAttr(default=None)  # if loaded from or saved to a SQLite file
+    _store_partial: int = PrivateAttr(default=0)  # number of QAs loaded if only the n_first QAs of the SQLite file are loaded
+    _stats: Optional[_ExpeStats] = PrivateAttr(default=None)  # once computed, see stats
 
-    def __init__(self, json_path: Path = None, n_first:int=0):
+    def __init__(self, json_path: Path = None, n_first:int=0, b_lazy:bool=False):
         """Expe can be init with only the n_first items from the JSON file
         Useful to test something on a small subset of questions at first
-        n_first = 0 to load eveything"""
+        n_first = 0 to load eveything
+        b_lazy = True to parse each QA only when it is accessed - the QAs are all parsed when a QA is added, and the
+        QAs are released once saved so that they are loaded again if accessed
+        If json_path is a SQLite file (".sqlite" or ".db"), the QAs are always loaded when accessed"""
         super().__init__()
         if json_path:
             self.json_path = json_path
-            self.load_from_json(path=json_path, n_first=n_first)
+            self.load_from_json(path=json_path, n_first=n_first, b_lazy=b_lazy)
+
+    def __iter__(self):
+        self._stats = None  # every QA may be modified
+        if self._lazy_items is not None:
+            return (self._lazy_items[i] for i in range(len(self._lazy_items)))
+        return super().__iter__()
+
+    def __getitem__(self, row: int) -> QA:
+        if isinstance(row, slice):
+            self._stats = None
+        else:
+            self.mark_dirty(row)  # the QA returned may be modified
+        if self._lazy_items is not None:
+            if isinstance(row, slice):
+                return [self._lazy_items[i] for i in range(len(self._lazy_items))[row]]
+            return self._lazy_items[row]
+        return super().__getitem__(row)
+
+    def __setitem__(self, row: int, qa: QA):
+        self.mark_dirty(row)
+        if self._lazy_items is not None:
+            self._lazy_items[row] = qa
+        else:
+            super().__setitem__(row, qa)
+
+    def __len__(self) -> int:
+        if self._lazy_items is not None:
+            return len(self._lazy_items)
+        return super().__len__()
+
+    def append(self, qa: QA):
+        self.materialise()
+        super().append(qa)
+        if self._stats:
+            self._stats.append(None)
+
+    def empty(self):
+        self.materialise()
+        super().empty()
+
+    def model_dump(self, **kwargs) -> dict:
+        self.materialise()
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        self.materialise()
+        return super().model_dump_json(**kwargs)
+
+    def materialise(self):
+        """Parses all the QAs not loaded yet if the Expe has been loaded lazily, so that they are all in self.items"""
+        if self._lazy_items is not None:
+            self.items = self._lazy_items.to_list()
+            self._lazy_items = None
+            if self._stats:  # same QAs
+                self._stats.source = self.items
+
+    def mark_dirty(self, row: Optional[int] = None):
+        """Marks the QA at index row, or every QA if row is None, as modified so that it is counted again by stats
+        The QAs accessed through the Expe are marked when accessed - call it when a QA kept from before a call to stats
+        is modified afterwards"""
+        if not self._stats:
+            return
+        if row is None:
+            self._stats = None
+        elif -len(self._stats.qa_stats) <= row < len(self._stats.qa_stats):
+            self._stats.dirty.add(row % len(self._stats.qa_stats))
+
+    def release(self, row: int, load: Optional[Callable[[], QA]] = None):
+        """Releases the QA once it has been persisted, so that the Expe does not keep every QA in memory when they are
+        all accessed, e.g. by a generator - the QA is loaded again when accessed, with load if given (e.g. from a journal),
+        from the Expe file otherwise - no effect if the Expe has not been loaded lazily"""
+        if self._lazy_items is not None:
+            self._lazy_items.release(row, key=load)
+
+    def close(self):
+        """Closes the file the QAs are lazily loaded from (memory-mapped JSON file or SQLite database) - the QAs not
+        loaded yet can no longer be accessed. An Expe can also be used as a context manager to close it:
+        `with Expe(json_path=path, b_lazy=True) as expe:`"""
+        if self._lazy_items is not None:
+            self._lazy_items.close_source()
+        self._close_store()
+
+    def __enter__(self) -> "Expe":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_qas(self) -> Iterator[QA]:
+        """Yields the QAs to read them - the QAs lazily loaded are not kept, so they must not be modified"""
+        if self._lazy_items is None:
+            return iter(self.items)
+        return (self._lazy_items.load(i) for i in range(len(self._lazy_items)))
 
     def stats(self) -> dict:
-        """Returns stats about the expe : nb models, nb questions, nb facts, nb answers, nb human eval, nb auto eval"""
-        res: dict = {}
-        res["questions"] = len([qa for qa in self if qa.question.text])
-        res["chunks"] = len([c for qa in self for c in qa.chunks if c])
-        res["facts"] = len([f for qa in self for f in qa.facts if f])
-        res["models"] = len(self[0].answers)
-        res["answers"] = len([a for qa in self for a in qa.answers if a.text])
-        res["human eval"] = len(
-            [a for qa in self for a in qa.answers if a.eval and a.eval.human]
-        )
-        res["auto eval"] = len(
-            [a for qa in self for a in qa.answers if a.eval and a.eval.auto]
-        )
-        return res
+        """Returns stats about the expe : nb models, nb questions, nb chunks, nb facts, nb answers, nb human eval, nb auto eval
+        and in "per model" the nb answers, human evals and auto evals of each model
+        The contribution of each QA is kept and only the QAs which may have changed since the last call, i.e. the ones
+        accessed through the Expe or marked with mark_dirty, are counted again, so that the stats are not computed
+        again from scratch on each save"""
+        source: Any = self._lazy_items if self._lazy_items is not None else self.items
+        if not self._stats or self._stats.source is not source or len(self._stats.qa_stats) != len(self):
+            self._stats = _ExpeStats(source, [_qa_stats(qa) for qa in self._read_qas()])
+        for row in self._stats.dirty:
+            qa: QA = self._lazy_items.load(row) if self._lazy_items is not None else self.items[row]
+            self._stats.update(row, _qa_stats(qa))
+        self._stats.dirty.clear()
+        return self._stats.result()
 
     def get_name(self) -> str:
         """Returns the name of the Expe based on the number of questions, answers..."""
@@ -208,14 +467,14 @@ class Expe(RagtimeList[QA]):
         b_add_suffix: bool = True,
         force_ext: str = None,
     ) -> Path:
-        if path and path.is_dir():
+        if path and Path(path).is_dir():
             if self.json_path:
-                path = path / self.json_path.stem
+                path = Path(path) / self.json_path.name
             else:
                 raise RagtimeException('No JSON file attached to this Expe and you provided only a folder Path')
         if not path:
             if self.json_path:
-                path = Path(self.json_path.parent) / self.json_path.stem
+                path = Path(self.json_path)
             else:
                 raise RagtimeException(f"Cannot save to JSON since no json_path is stored in expe and not path has been provided in argument.")
 
@@ -230,9 +489,11 @@ class Expe(RagtimeList[QA]):
         # If the provided path is a string, convert it to a Path
         result_path = Path(path) if isinstance(path, str) else path
 
+        # ".json.gz" and ".json.zst" are handled as single extensions
+        file_no_ext, ext = split_ext(result_path)
+
         # If a suffix is to be added, add it
         if b_add_suffix:
-            file_no_ext: str = result_path.stem
             # genrates the new suffix like --5M_50Q_141F_50A_38HE
             sep: str = "--"
             new_suf: str = self.get_name()
@@ -241,15 +502,11 @@ class Expe(RagtimeList[QA]):
                 file_no_ext = file_no_ext.replace(old_suf, new_suf)
             else:
                 file_no_ext = f"{file_no_ext}{sep}{new_suf}"
-            str_name: str = f"{file_no_ext}{result_path.suffix}"
-            result_path = result_path.parent / Path(str_name)
 
-        # Force ext
-        if force_ext:
-            if result_path.suffix:  # if already an extension, replace it
-                result_path = Path(str(result_path).replace(result_path.suffix, force_ext))
-            else:  # if no extension, just add it
-                result_path = Path(f"{result_path}{force_ext}")
+        # Force ext - compressed JSON and SQLite extensions are kept when saving to JSON
+        if force_ext and not (force_ext == ".json" and ext.lower() in JSON_EXTENSIONS + SQLITE_EXTENSIONS):
+            ext = force_ext
+        result_path = result_path.parent / f"{file_no_ext}{ext}"
 
         # If path exists and overwrite not allowed, raise an Exception
         if result_path.is_file() and not b_overwrite:
@@ -257,17 +514,92 @@ class Expe(RagtimeList[QA]):
 
         return result_path
 
-    def load_from_json(self, path: Path, n_first:int=0):
-        with open(path, mode="r", encoding="utf-8") as file:
-            data: list = json.load(file)
-            qa_list: dict = data
-            if "meta" in data:
-                self.meta = data["meta"]
-                qa_list = data["items"]
-            n_first = n_first if n_first else len(qa_list)
-            for json_qa in qa_list[:n_first]:
-                qa: QA = QA(**json_qa)
-                self.append(qa)
+    def load_from_json(self, path: Path, n_first:int=0, b_lazy:bool=False):
+        """Loads the QAs from a JSON file - the file is scanned and each QA is parsed separately, so that only
+        the n_first QAs are read if n_first > 0, and the QAs are parsed only when accessed if b_lazy is True"""
+        if is_sqlite_path(path):
+            self._load_from_sqlite(path, n_first=n_first)
+            return
+        buffer: ExpeFileBuffer = ExpeFileBuffer(path)
+        top_level, spans = scan_expe(buffer.buf, n_first=n_first)
+        if "meta" in top_level:
+            self.meta = buffer.parse(top_level["meta"]) or {}
+        make_qa = Expe._make_qa_function(buffer, top_level)
+        if b_lazy:
+            self.materialise()
+            # QAs already in the Expe are kept as is, the ones from the file are lazily loaded
+            self._lazy_items = LazyItems([None] * len(self.items) + spans, lambda span: make_qa(buffer.parse(span)), close=buffer.close)
+            for i, qa in enumerate(self.items):
+                self._lazy_items[i] = qa
+            self.items = []
+            return
+        for span in spans:
+            self.append(make_qa(buffer.parse(span)))
+        buffer.close()
+
+    def _load_from_sqlite(self, path: Path, n_first: int = 0):
+        """The Expe keeps the SQLite file open: QAs are read when accessed and saving without a path only writes
+        the QAs which changed"""
+        store: ExpeStore = Expe._open_store(path)
+        nb_qas: int = min(n_first, len(store)) if n_first else len(store)
+        self.meta = store.load_meta()
+        if len(self):  # QAs already in the Expe: the QAs from the file are added to them and the file is not kept open
+            for idx in range(nb_qas):
+                self.append(store.load_qa(idx))
+            store.close()
+            return
+        self._store = store
+        self._store_partial = nb_qas if nb_qas < len(store) else 0
+        self._lazy_items = LazyItems(list(range(nb_qas)), lambda idx: self._store.load_qa(idx))
+
+    @staticmethod
+    def _open_store(path: Path) -> ExpeStore:
+        return ExpeStore(path, make_qa=lambda json_qa: QA(**json_qa), make_chunk=lambda c: Chunk(**c))
+
+    def _close_store(self):
+        if self._store:
+            self._store.close()
+            self._store = None
+            self._store_partial = 0
+
+    def find(self, question: str) -> Optional[QA]:
+        """Returns the first QA with this question text, None if not found - uses the index of the SQLite file if any"""
+        if self._store:
+            idx: Optional[int] = next((i for i in self._store.find(question) if i < len(self)), None)
+            # the QA may have been modified since it was saved, so its question is checked
+            if idx is not None and self[idx].question.text == question:
+                return self[idx]
+        return next((qa for qa in self if qa.question.text == question), None)
+
+    @staticmethod
+    def _make_qa_function(buffer: ExpeFileBuffer, top_level: dict):
+        """Returns the function converting a QA parsed from the file into a QA object - if the file has a chunk table,
+        the chunk ids are replaced with Chunk objects shared by all the QAs"""
+        if "chunk_table" not in top_level:
+            return lambda json_qa: QA(**json_qa)
+        chunk_table: ChunkTable = ChunkTable(table=buffer.parse(top_level["chunk_table"]), make_chunk=lambda c: Chunk(**c))
+        return lambda json_qa: QA(**chunk_table.resolve_qa(json_qa))
+
+    @staticmethod
+    def iter_from_json(path: Path, n_first:int=0) -> Iterator[QA]:
+        """Yields the QAs of a JSON file one by one, without keeping them in memory
+        Useful to read a big Expe file, e.g. to compute statistics"""
+        if is_sqlite_path(path):
+            store: ExpeStore = Expe._open_store(path)
+            try:
+                for idx in range(min(n_first, len(store)) if n_first else len(store)):
+                    yield store.load_qa(idx)
+            finally:
+                store.close()
+            return
+        buffer: ExpeFileBuffer = ExpeFileBuffer(path)
+        try:
+            top_level, spans = scan_expe(buffer.buf, n_first=n_first)
+            make_qa = Expe._make_qa_function(buffer, top_level)
+            for span in spans:
+                yield make_qa(buffer.parse(span))
+        finally:
+            buffer.close()
 
     def filter_answer(self, llm_facts_name: str):
         """
@@ -281,6 +613,68 @@ class Expe(RagtimeList[QA]):
             ]
             qa.answers = Answers(items=filtered_answers)
 
+    def split(self, n: int = 0, key: Union[str, Callable[[QA], Any]] = None) -> list["Expe"]:
+        """Splits the Expe in shards, e.g. to generate the answers on several machines - merge them back with Expe.merge
+        - n: number of shards of consecutive QAs with the same number of QAs (+/- 1)
+        - key: path of a value in the QAs (see QA.get_attr) or function returning a value for a QA - one shard per value,
+        in the order in which the values appear
+        Each shard has the meta of the Expe and a "shard" entry in its meta with its number, the number of shards and its key if any
+        The QAs and the meta are copied in the shards so that the Expe is not modified when the shards are
+        """
+        if (n > 0) == (key is not None):
+            raise RagtimeException("Give either the number of shards n or a key to split the Expe")
+        groups: dict[Any, list[QA]] = {}
+        if key is not None:
+            get_key: Callable[[QA], Any] = compile_path(key) if isinstance(key, str) else key
+            for qa in self:
+                value: Any = get_key(qa)
+                groups.setdefault(str(value) if isinstance(value, (list, dict)) else value, []).append(qa.model_copy(deep=True))
+        else:
+            size, extra = divmod(len(self), n)
+            qas: Iterator[QA] = iter(self)
+            for i in range(n):
+                groups[None, i] = [qa.model_copy(deep=True) for qa in itertools.islice(qas, size + (1 if i < extra else 0))]
+        shards: list[Expe] = []
+        for i, (value, qas) in enumerate(groups.items()):
+            shard: Expe = Expe()
+            shard.items = qas
+            shard.meta = {**deepcopy(self.meta or {}), "shard": {"number": i + 1, "count": len(groups)}}
+            if key is not None:
+                shard.meta["shard"]["key"] = value
+            shards.append(shard)
+        return shards
+
+    @staticmethod
+    def merge(*expes: Union["Expe", Path]) -> "Expe":
+        """Merges Expes, e.g. the shards made with Expe.split once their answers have been generated on several machines
+        The QAs are matched with a fingerprint of their question (case and whitespaces are ignored) and keep the order in
+        which they appear, from the first Expe to the last
+        For a QA in several Expes, the answers are unioned per LLM name - if several Expes have an answer from the same LLM,
+        the one with the latest LLMAnswer.timestamp is kept, with the human eval of the other one if it has none
+        expes can be Expe objects, which are not modified, or paths to Expe files, which are read one by one
+        The meta of the Expes are merged as well, the "shard" entry added by Expe.split being removed
+        """
+        qas: dict[str, QA] = {}
+        meta: dict = {}
+        for source in expes:
+            b_copy: bool = isinstance(source, Expe)  # QAs of an Expe given are copied so that it is not modified
+            with nullcontext(source) if b_copy else Expe(json_path=Path(source), b_lazy=True) as expe:
+                meta = {**(expe.meta or {}), **meta}
+                for qa in expe:
+                    if b_copy:
+                        qa = qa.model_copy(deep=True)
+                    fingerprint: str = question_fingerprint(qa.question.text)
+                    if fingerprint in qas:
+                        _merge_qa(qas[fingerprint], qa)
+                    else:
+                        qas[fingerprint] = qa
+        result: Expe = Expe()
+        result.items = list(qas.values())
+        meta.pop("shard", None)
+        result.meta = meta
+        logger.info(f"{len(expes)} Expes merged - {len(result)} QAs")
+        return result
+
     # TODO: Cannot implement this function due to circular imports issue (need objects from generators.py objects and generators.py needs
     # expe.py objects too) - if someone finds a way, that would be nice since it would allow to easily chain Answer, Facts and Eval generation
     # def gen_Eval(self, folder_out:Path, prompter:Prompter, llm_names:list[str],
@@ -307,6 +701,9 @@ class Expe(RagtimeList[QA]):
         - update_type (UpdateTypes): can be "human_eval" or "facts"
         - question_col (int): indicates the column number (starts at 0) where the questions are - default: DEFAULT_QUESTION_COL-1 (0 based)
         - answer_col (in): used if update_type==human_eval, since the eval entered in the spreadsheet has to be matched with a specific answer
+        The workbook is read in streaming mode and the questions and answers are matched with indexes built once
+        Returns a summary: number of rows read, questions matched, questions not found, values updated, rows whose
+        answer was not found and rows with an invalid human eval
         """
 
         def starts_with_num(fact: str) -> bool:
@@ -319,8 +716,8 @@ class Expe(RagtimeList[QA]):
                     pass
             return result
 
-        wb: Workbook = load_workbook(path)
-        ws: Worksheet = wb[sheet_name]
+        wb: Workbook = load_workbook(path, read_only=True)
+        ws = wb[sheet_name]
         cur_qa: QA = None
         if not data_col:
             data_cols: dict = {
@@ -329,49 +726,85 @@ class Expe(RagtimeList[QA]):
             }
             data_col = data_cols[update_type] - 1
 
+        # Indexes built once: normalised question -> first QA with this question, and per QA answer text -> first Answer
+        # texts are normalised as written by save_to_spreadsheet (illegal characters removed)
+        def key(text: Any) -> str:
+            return convert_value(str(text))
+
+        qa_index: dict[str, QA] = {}
+        for qa in self:
+            qa_index.setdefault(key(qa.question.text).lower(), qa)
+        answer_indexes: dict[int, dict[str, Answer]] = {}
+
+        def find_answer(qa: QA, answer_text: str) -> Optional[Answer]:
+            if id(qa) not in answer_indexes:
+                answer_indexes[id(qa)] = {}
+                for a in qa.answers:
+                    answer_indexes[id(qa)].setdefault(key(a.text), a)
+            return answer_indexes[id(qa)].get(key(answer_text))
+
+        def value(row: tuple, col: int):
+            return row[col] if col < len(row) else None
+
+        summary: dict = {"rows": 0, "questions matched": 0, "questions not found": [], "values updated": 0,
+                         "answers not found": [], "invalid values": []}
         new_facts: Facts = (
             Facts()
         )  # the new facts to replace the old ones in the current QA
 
-        # For each row in the worksheet
-        for i, row in enumerate(ws.iter_rows(min_row=header_size + 1), start=1):
-            if row[question_col].value:  # a question is in the current row, so a new question starts
-                if cur_qa:  # not first question
+        # For each row in the worksheet - the workbook is read in streaming mode
+        for i, row in enumerate(ws.iter_rows(min_row=header_size + 1, values_only=True), start=1):
+            summary["rows"] += 1
+            question: Any = value(row, question_col)
+            if question:  # a question is in the current row, so a new question starts
+                if cur_qa and update_type == UpdateTypes.facts:  # not first question
                     cur_qa.facts = new_facts
-                cur_qa = next((qa for qa in self if qa.question.text.lower() == row[question_col].value.lower()), None)  # get the corresponding QA in the Expe
+                cur_qa = qa_index.get(key(question).lower())  # get the corresponding QA in the Expe
                 new_facts: Facts = Facts()
+                if cur_qa:
+                    summary["questions matched"] += 1
+                else:
+                    summary["questions not found"].append(str(question))
 
             if cur_qa:  # QA and question in the worksheet is made
-                data_in_ws = row[data_col].value
+                data_in_ws = value(row, data_col)
                 if data_in_ws:
                     if update_type == UpdateTypes.facts:  # Update FACTS
+                        data_in_ws = str(data_in_ws)  # numbers are read as int or float in the worksheet
                         if not starts_with_num(data_in_ws):  # if the fact in the ws does not start with a number, add it
                             data_in_ws = f"{len(new_facts) + 1}. {data_in_ws}"
                         new_facts.append(Fact(text=data_in_ws))
+                        summary["values updated"] += 1
                     elif update_type == UpdateTypes.human_eval:  # Update HUMAN EVAL
-                        answer_text: str = row[answer_col].value
-                        cur_ans: Answer = next((a for a in cur_qa.answers if a.text == answer_text), None)
+                        answer_text: str = value(row, answer_col)
+                        cur_ans: Answer = find_answer(cur_qa, answer_text)
                         if cur_ans:  # corresponding Answer has been found
                             try:
                                 human_eval: int = int(data_in_ws)
                                 cur_ans.eval.human = human_eval
+                                summary["values updated"] += 1
                             except (TypeError, ValueError):
+                                summary["invalid values"].append(i)
                                 logger.warn(f'Human eval should be a value between 0 and 1 - cannot use "{data_in_ws}" as found in line {i}')
                         else:
+                            summary["answers not found"].append(i)
                             logger.warn(f'Cannot find Answer corresponding with the human eval "{data_in_ws}" - Answer should contain the text "{answer_text}"')
-        
+        wb.close()
+
         # Save facts for the last question
         if cur_qa and update_type == UpdateTypes.facts:
             cur_qa.facts = new_facts
 
-
+        logger.info(f'{summary["rows"]} rows read, {summary["questions matched"]} questions matched, '
+                    f'{len(summary["questions not found"])} not found, {summary["values updated"]} values updated')
+        return summary
 
     def save_temp(self, name: str = "TEMP_"):
         """Save the expe as is as a temporary backup. Useful to save the work already done
         when an Exception occurs or if you want to create intermediate backups while computing.
         """
         if self.json_path:
-            file_name: str = f"{name}{self.json_path.stem}"
+            file_name: str = f"{name}{self.json_path.name}"
             file_path: str = self.json_path.parent
         else:
             file_name: str = f"{name}.json"
@@ -380,18 +813,141 @@ class Expe(RagtimeList[QA]):
             path=Path(file_path) / Path(file_name), b_overwrite=True, b_add_suffix=True
         )
 
-    def save_to_json(self, path: Path = None, b_overwrite: bool = False, b_add_suffix: bool = True) -> Path:
+    def save_to_json(self, path: Path = None, b_overwrite: bool = False, b_add_suffix: bool = True,
+                     b_chunk_table: bool = False, b_indent: bool = False) -> Path:
         """
         Saves Expe to JSON - can generate a suffix for the filename
+        The file is compressed if its extension is ".json.gz" (gzip) or ".json.zst" (zstd)
+        The Expe is saved in a SQLite database if the extension is ".sqlite" or ".db" - if the Expe has been loaded from
+        or saved to a SQLite file and no other path is given, only the QAs which changed are written in this file
+        If b_chunk_table is True, each chunk is saved once in a "chunk_table" and the QAs only contain references to
+        it - smaller files, but they cannot be read by ragtime versions before 0.0.44 - by default, full copies of the
+        chunks are saved in each QA
+        b_indent = True to write indented JSON, e.g. to debug
         Returns the Path of the file actually saved
         """
+        if self._store and (not path or Path(path) == self._store.path):
+            return self._save_to_sqlite()
         path: Path = self._file_check_before_writing(path, b_overwrite=b_overwrite, b_add_suffix=b_add_suffix, force_ext=".json")
-        with open(path, mode="w", encoding="utf-8") as file:
-            file.write(self.model_dump_json(indent=2))
+        if is_sqlite_path(path):
+            if self._store:  # the QAs not loaded are copied with the database
+                store: ExpeStore = self._store.copy_to(path)
+                self._store.close()
+                self._store = store
+            else:
+                remove_database(path)
+                self._store = Expe._open_store(path)
+            return self._save_to_sqlite()
+        if self._lazy_items is not None and not b_indent:
+            self._save_lazy_to_json(path, b_chunk_table=b_chunk_table)
+        else:
+            self.materialise()  # the file may be the one the QAs are lazily loaded from
+            self._close_store()
+            self._save_items_to_json(path, b_chunk_table=b_chunk_table, b_indent=b_indent)
+        write_stats(path, self.stats())
         self.json_path = path
         logger.info(f"Expe saved as JSON to {path}")
         return path
 
+    def _save_items_to_json(self, path: Path, b_chunk_table: bool, b_indent: bool):
+        if b_chunk_table:
+            chunk_table: ChunkTable = ChunkTable()
+            data: dict = self.model_dump(mode="json", exclude={"items"})
+            items: list[dict] = [chunk_table.ref_qa(qa.model_dump(mode="json")) for qa in self]
+            data["chunk_table"] = chunk_table.table  # written before the items so they can be resolved while reading
+            data["items"] = items
+            json_bytes: bytes = dumps(data, b_indent=b_indent)
+        else:
+            json_bytes: bytes = self.model_dump_json(indent=2 if b_indent else None).encode("utf-8")
+        write_bytes(path, json_bytes)
+
+    def _save_lazy_to_json(self, path: Path, b_chunk_table: bool):
+        """Saves a lazily loaded Expe QA by QA, so that the QAs not in memory are loaded one at a time and not kept -
+        each QA is written once serialized - the Expe is then lazily loaded from the new file
+        With a chunk table, which has to be written before the QAs, the QAs are written in a temporary file first"""
+        chunk_table: Optional[ChunkTable] = ChunkTable() if b_chunk_table else None
+        data: dict = RagtimeList.model_dump(self, mode="json", exclude={"items"})
+        qa_stats: list[tuple] = []  # counted while the QAs are loaded
+        # written next to the file first since it may be the one the QAs are lazily loaded from
+        temp_path: Path = path.with_name(f".tmp_{path.name}")  # same extension, so same compression
+        spool = tempfile.TemporaryFile(dir=path.parent) if chunk_table else nullcontext()
+        try:
+            with open_to_write(temp_path) as file, spool as spool_file:
+                items_file = spool_file or file
+                if not chunk_table:
+                    file.write(dumps(data)[:-1] + (b',"items":[' if data else b'"items":['))
+                for i in range(len(self._lazy_items)):
+                    qa: QA = self._lazy_items.load(i)
+                    qa_stats.append(_qa_stats(qa))
+                    if i:
+                        items_file.write(b",")
+                    items_file.write(dumps(chunk_table.ref_qa(qa.model_dump(mode="json"))) if chunk_table
+                                     else qa.model_dump_json().encode("utf-8"))
+                if chunk_table:
+                    data["chunk_table"] = chunk_table.table
+                    file.write(dumps(data)[:-1] + b',"items":[')
+                    items_file.seek(0)
+                    shutil.copyfileobj(items_file, file)
+                file.write(b"]}")
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        in_memory: list[tuple[int, QA]] = list(self._lazy_items.in_memory())
+        self._lazy_items.close_source()
+        self._lazy_items = None
+        self._close_store()
+        temp_path.replace(path)
+        # the QAs in memory are the ones just saved: they are kept, only released
+        self.load_from_json(path, b_lazy=True)
+        for i, qa in in_memory:
+            self._lazy_items[i] = qa
+            self._lazy_items.release(i)
+        self._stats = _ExpeStats(self._lazy_items, qa_stats)
+
+    def save_to_parquet(self, path: Path = None, b_overwrite: bool = False, b_add_suffix: bool = True,
+                        batch_size: int = DEFAULT_PARQUET_BATCH_SIZE) -> Path:
+        """
+        Saves Expe to 3 Parquet files for analytics: "name.answers.parquet", "name.facts.parquet" and "name.chunks.parquet"
+        - see ragtime.expe_parquet for the schema - the JSON file remains the reference since the Expe cannot be loaded back
+        from the Parquet files
+        The QAs are written by batches of batch_size
+        Returns the Path of the answers file
+        """
+        path: Path = self._file_check_before_writing(path, b_overwrite=True, b_add_suffix=b_add_suffix, force_ext=".parquet")
+        existing: list[str] = [p.name for p in parquet_paths(path).values() if p.is_file()]
+        if existing and not b_overwrite:
+            raise FileExistsError(f'"{existing[0]}" already exists! Set b_overwrite=True to allow overwriting.')
+        paths: dict[str, Path] = save_to_parquet(self, path, expe_meta=self.meta, batch_size=batch_size)
+        logger.info(f"Expe saved as Parquet to {path.parent / (split_ext(path)[0] + '.[answers|facts|chunks].parquet')}")
+        return paths["answers"]
+
+    @staticmethod
+    def load_from_parquet(path: Path) -> dict:
+        """Returns the tables saved with save_to_parquet as a dict with keys "answers", "facts" and "chunks" and pyarrow Tables
+        as values - the files are memory-mapped and no QA object is created
+        path can be "name.parquet" or the path of one of the tables, e.g. "name.answers.parquet" """
+        return load_from_parquet(path)
+
+    def _save_to_sqlite(self) -> Path:
+        if self._store_partial and len(self) != self._store_partial:
+            raise RagtimeException("The Expe has been loaded with n_first and QAs have been added or removed - save it to a JSON file")
+        # QAs not loaded yet have not been modified
+        qas = list(self._lazy_items.in_memory()) if self._lazy_items is not None else enumerate(self.items)
+        nb_written: int = self._store.write(qas, meta=self.meta, length=None if self._store_partial else len(self))
+        if self._lazy_items is None:  # the QAs are now loaded from the file, so the next saves only serialize the ones accessed
+            self._lazy_items = LazyItems(list(range(len(self.items))), lambda idx: self._store.load_qa(idx))
+            for idx, qa in enumerate(self.items):
+                self._lazy_items[idx] = qa
+            self.items = []
+            if self._stats:
+                self._stats.source = self._lazy_items
+        self._lazy_items.release_all()  # the QAs saved are loaded again from the file if they are no longer used
+        self.json_path = self._store.path
+        self._store.checkpoint()  # the signature of the file must not change when the connection is closed
+        write_stats(self.json_path, self.stats())
+        logger.info(f"Expe saved to SQLite {self.json_path} - {nb_written} QAs written")
+        return self.json_path
+
     def save_to_html(
         self,
         path: Path = None,
@@ -403,31 +959,90 @@ class Expe(RagtimeList[QA]):
         b_show_facts:bool = True,
         b_show_evals:bool = True,        
         template_path: Path = DEFAULT_HTML_TEMPLATE,
+        page_size: int = 0,
+        b_lazy_chunks: bool = False,
     ):
         """
         Saves Expe to an HTML file from a Jinja template - can generate a suffix for the filename
+        The template is compiled once and the report is written to the file while it is rendered
+        - page_size: if > 0, the QAs are written in pages of page_size QAs ("name_p1.html", "name_p2.html"...) and
+        the file saved is an index page linking to the pages
+        - b_lazy_chunks: the chunks of each page are written in a side file "<page>.chunks.js" loaded only when the user
+        clicks on "Show chunks", so that the page loads quickly
         Returns the Path of the file actually saved
         """
         path: Path = self._file_check_before_writing(path, b_overwrite=b_overwrite, b_add_suffix=b_add_suffix, force_ext=".html")
-        environment = Environment(loader=FileSystemLoader(searchpath=template_path.parent, encoding="utf-8")        )
         render_params:dict[str, bool] = {
             "show_answers": b_show_answers,
             "show_chunks": b_show_chunks,
             "show_facts": b_show_facts,
             "show_evals": b_show_evals,
         }
-        template = environment.get_template(template_path.name)
+        template = get_template(template_path)
         context = {
-            "expe": self,
             **render_params,
             "report_name": self.get_name(),
             "sub": (lambda pattern, repl, s: re.sub(pattern, repl, s)),
         }
-        with open(path, mode="w", encoding="utf-8") as file:
-            file.write(template.render(context))
-        logger.info(f"Expe saved as HTML to {path}")
+        b_lazy_chunks = b_lazy_chunks and b_show_chunks
+        if page_size <= 0 or len(self) <= page_size:
+            write_page(template, context, self, self, path, b_lazy_chunks=b_lazy_chunks)
+            logger.info(f"Expe saved as HTML to {path}")
+            return path
+
+        nb_pages: int = math.ceil(len(self) / page_size)
+        pages: list[dict] = []
+        qas: Iterator[QA] = iter(self)
+        for number in range(1, nb_pages + 1):
+            page_qas: list[QA] = list(itertools.islice(qas, page_size))
+            first_index: int = (number - 1) * page_size
+            page: Path = page_path(path, number, nb_pages)
+            write_page(template, {**context, **page_links(path, number, nb_pages)}, self, page_qas, page,
+                       first_index=first_index, b_lazy_chunks=b_lazy_chunks)
+            pages.append({"file": page.name, "number": number, "first": first_index + 1,
+                          "last": first_index + len(page_qas), "question": page_qas[0].question.text})
+        write_index(path, self.get_name(), pages, len(self))
+        logger.info(f"Expe saved as HTML to {path} - {nb_pages} pages of {page_size} QAs")
         return path
 
+    @staticmethod
+    def _spreadsheet_accessors(ws_conf: list[str]) -> dict[int, PathAccessor]:
+        """Compiled paths of the spreadsheet configuration row, per column"""
+        return {
+            col: compile_path(p)
+            for col, p in enumerate(ws_conf, start=1)
+            if isinstance(p, str) and p and p != "#" and p[0] != "="
+        }
+
+    def get_column(self, path: str) -> list[Any]:
+        """Returns the value at path for every QA, e.g. expe.get_column('answers[i].eval.auto') - the path is compiled once"""
+        accessor: PathAccessor = compile_path(path)
+        return [accessor(qa) for qa in self._read_qas()]
+
+    def _spreadsheet_rows(self, ws_conf: list[str], header_size: int) -> Iterator[tuple[int, dict[int, Any]]]:
+        """Yields the row number and the values per column written by save_to_spreadsheet - a QA can take several rows
+        if a path in ws_conf contains "[i]" """
+        accessors: dict[int, PathAccessor] = Expe._spreadsheet_accessors(ws_conf)
+        row: int = header_size + 1
+        for num_q, qa in enumerate(self._read_qas(), start=1):
+            rows: dict[int, dict[int, Any]] = defaultdict(dict)
+            for col, p in enumerate(ws_conf, start=1):
+                if p == "#":  # special token # used to indicate question number
+                    val = [num_q]
+                elif not isinstance(p, str) or p[0] == "=":  # formulas are written afterwards
+                    continue
+                else:
+                    val = accessors[col](qa)
+                    if val is None or val == []:
+                        val = [""]  # write a blank if nothing is found
+                if not isinstance(val, list):
+                    val = [val]
+                for offset, v in enumerate(val):
+                    rows[row + offset][col] = convert_value(v)
+            for r in sorted(rows):
+                yield r, rows[r]
+            row = max(rows, default=row - 1) + 1
+
     def save_to_spreadsheet(
         self,
         path: Path = None,
@@ -436,8 +1051,11 @@ class Expe(RagtimeList[QA]):
         sheet_name: str = DEFAULT_WORKSHEET,
         b_overwrite: bool = False,
         b_add_suffix: bool = True,
+        b_fast: bool = False,
     ):
         """Saves Expe to a spreadsheet - can generate a suffix for the filename
+        b_fast = True to stream the rows in the file instead of writing them cell by cell with openpyxl - the layout is
+        the same and it is much faster and uses much less memory for big Expes
         Returns the Path of the file actually saved"""
         path: Path = self._file_check_before_writing(path, b_overwrite=b_overwrite, b_add_suffix=b_add_suffix, force_ext=".xlsx")
 
@@ -469,7 +1087,8 @@ class Expe(RagtimeList[QA]):
                 # write the value since it does not need to be done for each row
                 p: str = val[: val.find(",")]
                 # get the first non empty value in the required column
-                val = next((qa.get_attr(p) for qa in self if qa.get_attr(p)), "")
+                accessor: PathAccessor = compile_path(p)
+                val = next((v for v in map(accessor, self) if v), "")
                 ws.cell(row=row, column=cell.column, value=val)
 
         qa: QA
@@ -480,6 +1099,15 @@ class Expe(RagtimeList[QA]):
             if ws.cell(column=c, row=row).value
             and str(ws.cell(column=c, row=row).value)[0] == "="
         }
+        if b_fast:
+            template_max_row: int = ws.max_row
+            wb.save(path)
+            write_rows_to_sheet(path, sheet_name, header_size, template_max_row, col_with_formulas,
+                                self._spreadsheet_rows(ws_conf, header_size))
+            logger.info(f"Expe saved as Spreadsheet to {path}")
+            return path
+
+        accessors: dict[int, PathAccessor] = Expe._spreadsheet_accessors(ws_conf)
         for num_q, qa in enumerate(self, start=1):  # write each row in expe
             next_row: int = 0
             for col, p in enumerate(ws_conf, start=1):
@@ -489,7 +1117,7 @@ class Expe(RagtimeList[QA]):
                     continue
                 else:  # if it is a path to get a value in QA, get it
                     # Get value in the QA object
-                    val = qa.get_attr(p)
+                    val = accessors[col](qa)
                     if val is None or val == []:
                         val = [""]  # write a blank if nothing is found
                 if not isinstance(val, list):
@@ -498,13 +1126,7 @@ class Expe(RagtimeList[QA]):
                 # Write the value(s)
                 for offset, v in enumerate(val):
                     # Do standard conversions to string
-                    if isinstance(v, list):
-                        v = str(v)
-                    elif isinstance(v, datetime):
-                        v = v.strftime("%d/%m/%Y %H:%M:%S")
-                    elif isinstance(v, str):
-                        # Remove illegal characters before writing the value
-                        v = ILLEGAL_CHARACTERS_RE.sub("", str(v))
+                    v = convert_value(v)
                     # Write value
                     ws.cell(row=row + offset, column=col).value = v
                     # From second row copy cell style from the one up
@@ -530,18 +1152,55 @@ class Expe(RagtimeList[QA]):
         return path
 
 
-def analyse_expe_folder(path: Path):
+def expe_file_stats(path: Path) -> dict:
+    """Returns the stats of the Expe file - read from its sidecar file if the Expe file has not changed since the
+    stats were saved, otherwise the Expe is loaded and its sidecar file is updated"""
+    stats: Optional[dict] = read_stats(path)
+    if stats is None:
+        with Expe(json_path=path, b_lazy=True) as exp:
+            stats = exp.stats()
+        write_stats(path, stats)
+    return stats
+
+
+def analyse_expe_folder(path: Path, b_print: bool = True, max_workers: Optional[int] = None) -> dict[str, list]:
+    """Returns the stats of the Expe files in the folder as a table: a dict with the column names as keys
+    ("File", "questions", "chunks"...) and a list of values per column, one per file - printed if b_print
+    The stats are read from the sidecar files written with the Expe files - the files without up to date stats
+    are loaded in a pool of max_workers processes (default: number of CPUs)"""
+    path = Path(path)
     if not path.is_dir():
         raise Exception(f'"{path}" is not a folder - please provide one')
-    print(f'In "{path}":')
+    files: list[Path] = sorted(f for f in path.iterdir() if is_expe_file(f))
+    all_stats: dict[Path, dict] = {f: read_stats(f) for f in files}
+    to_load: list[Path] = [f for f, stats in all_stats.items() if stats is None]
+    if len(to_load) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures: dict = {f: executor.submit(expe_file_stats, f) for f in to_load}
+            for f, future in futures.items():
+                try:
+                    all_stats[f] = future.result()
+                except Exception as e:
+                    logger.error(f'Cannot get the stats of "{f.name}": {e}')
+    else:
+        for f in to_load:
+            try:
+                all_stats[f] = expe_file_stats(f)
+            except Exception as e:
+                logger.error(f'Cannot get the stats of "{f.name}": {e}')
+
     res: defaultdict = defaultdict(list)
-    for f in [f for f in path.iterdir() if f.is_file() and f.suffix == ".json"]:
-        exp: Expe = Expe(json_path=f)
+    for f, stats in all_stats.items():
+        if stats is None:
+            continue
         res["File"].append(f.name)
-        for k, v in exp.stats():
-            res[k].append(v)
-
-    print(tabulate(res, headers="keys"))
+        for k, v in stats.items():
+            if k != "per model":
+                res[k].append(v)
+    if b_print:
+        print(f'In "{path}":')
+        print(tabulate(res, headers="keys"))
+    return dict(res)
 
 
 # DEPRECATED
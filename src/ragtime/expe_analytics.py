@@ -0,0 +1,298 @@
+"""
+Analytics on the evaluations of an Expe with NumPy
+The evals are extracted once in arrays - one value per Answer - and the aggregations are vectorised:
+- means per model of the eval fields, e.g. "auto", "human", "precision" and "recall" as written by the eval prompters
+- agreement between the human and the automatic evals
+- confidence intervals of the means per model, and of their differences with a baseline model, with a paired bootstrap:
+the questions are resampled and every model is evaluated on the same resampled questions
+- token usage of the LLM calls per model and per prompter, and throughput over time
+"""
+
+from ragtime.base import RagtimeException
+
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Fields read on the Eval itself - the other fields are read in Eval.meta
+EVAL_ATTRIBUTES: tuple[str, ...] = ("auto", "human")
+DEFAULT_EVAL_FIELDS: tuple[str, ...] = ("auto", "human", "precision", "recall")
+# Max number of values (resamples x questions) per batch in the bootstrap, to bound the memory used
+_BOOTSTRAP_BATCH_VALUES: int = 20_000_000
+
+
+def _check_numpy():
+    if not np:
+        raise RagtimeException('Package "numpy" is needed for the analytics - run "pip install numpy"')
+
+
+class EvalArrays:
+    """The evals of an Expe as arrays with one value per Answer
+    - qa_index: index of the QA of the Answer
+    - model: index of the model of the Answer in models
+    - values: field -> array of the values, NaN when the Answer has no value for this field"""
+
+    def __init__(self, qa_index: "np.ndarray", model: "np.ndarray", models: list[str], values: dict[str, "np.ndarray"], nb_qas: int):
+        self.qa_index: np.ndarray = qa_index
+        self.model: np.ndarray = model
+        self.models: list[str] = models
+        self.values: dict[str, np.ndarray] = values
+        self.nb_qas: int = nb_qas
+
+    def __len__(self) -> int:
+        return len(self.qa_index)
+
+    def matrix(self, field: str) -> "np.ndarray":
+        """Returns the values of the field as a (QAs x models) matrix, NaN if the QA has no Answer from the model
+        If a QA has several Answers from the same model, the last one is kept"""
+        result: np.ndarray = np.full((self.nb_qas, len(self.models)), np.nan)
+        result[self.qa_index, self.model] = self.values[field]
+        return result
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def extract_evals(qas: Iterable, fields: Iterable[str] = DEFAULT_EVAL_FIELDS) -> EvalArrays:
+    """Extracts the eval fields of every Answer in one pass - fields in EVAL_ATTRIBUTES are read on the Eval, the others
+    in Eval.meta - Answers without LLM name are grouped in the model "?" """
+    _check_numpy()
+    fields = list(fields)
+    models: dict[str, int] = {}
+    qa_index: list[int] = []
+    model: list[int] = []
+    values: dict[str, list[float]] = {f: [] for f in fields}
+    nb_qas: int = 0
+    for num_qa, qa in enumerate(qas):
+        nb_qas = num_qa + 1
+        for answer in qa.answers or []:
+            name: str = (answer.llm_answer.name or answer.llm_answer.full_name) if answer.llm_answer else None
+            qa_index.append(num_qa)
+            model.append(models.setdefault(name or "?", len(models)))
+            ans_eval = answer.eval
+            meta: dict = (ans_eval.meta or {}) if ans_eval else {}
+            for f in fields:
+                value = getattr(ans_eval, f, None) if f in EVAL_ATTRIBUTES else meta.get(f)
+                values[f].append(_to_float(value) if ans_eval else np.nan)
+    return EvalArrays(
+        qa_index=np.array(qa_index, dtype=np.int64),
+        model=np.array(model, dtype=np.int64),
+        models=list(models),
+        values={f: np.array(v, dtype=np.float64) for f, v in values.items()},
+        nb_qas=nb_qas,
+    )
+
+
+def model_means(evals: EvalArrays) -> dict[str, dict[str, float]]:
+    """Returns the mean and the number of values of each field per model, e.g. {"gpt-4": {"auto": 0.7, "nb auto": 120...}}
+    - the Answers without value for a field are ignored"""
+    _check_numpy()
+    nb_models: int = len(evals.models)
+    res: dict[str, dict[str, float]] = {m: {} for m in evals.models}
+    for field, values in evals.values.items():
+        valid: np.ndarray = ~np.isnan(values)
+        counts: np.ndarray = np.bincount(evals.model[valid], minlength=nb_models)
+        sums: np.ndarray = np.bincount(evals.model[valid], weights=values[valid], minlength=nb_models)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means: np.ndarray = sums / counts
+        for m, name in enumerate(evals.models):
+            res[name][field] = float(means[m]) if counts[m] else None
+            res[name][f"nb {field}"] = int(counts[m])
+    return res
+
+
+def _agreement(human: "np.ndarray", auto: "np.ndarray", threshold: float) -> dict[str, float]:
+    nb: int = len(human)
+    if not nb:
+        return {"nb": 0, "agreement": None, "mean abs diff": None, "correlation": None}
+    correlation: Optional[float] = None
+    if nb > 1 and np.std(human) > 0 and np.std(auto) > 0:
+        correlation = float(np.corrcoef(human, auto)[0, 1])
+    return {
+        "nb": nb,
+        "agreement": float(np.mean((human >= threshold) == (auto >= threshold))),
+        "mean abs diff": float(np.mean(np.abs(human - auto))),
+        "correlation": correlation,
+    }
+
+
+def human_auto_agreement(evals: EvalArrays, threshold: float = 0.5, human: str = "human", auto: str = "auto") -> dict[str, dict[str, float]]:
+    """Agreement between the human and the automatic evals of the Answers having both, per model and for "all" models:
+    - agreement: rate of Answers where both evals are on the same side of threshold
+    - mean abs diff: mean of |human - auto|
+    - correlation: Pearson correlation (None if not defined)"""
+    _check_numpy()
+    h, a = evals.values[human], evals.values[auto]
+    both: np.ndarray = ~np.isnan(h) & ~np.isnan(a)
+    res: dict[str, dict[str, float]] = {"all": _agreement(h[both], a[both], threshold)}
+    for m, name in enumerate(evals.models):
+        mask: np.ndarray = both & (evals.model == m)
+        res[name] = _agreement(h[mask], a[mask], threshold)
+    return res
+
+
+def _resampled_means(values: "np.ndarray", valid: "np.ndarray", n_resamples: int, rng) -> "np.ndarray":
+    """Means per column of values (QAs x columns) over n_resamples resamples of the QAs (rows) - returns (n_resamples x columns)
+    Each resample is a vector of counts per QA, so that the sums are computed with one matrix product per batch"""
+    nb_qas: int = values.shape[0]
+    batch: int = max(1, _BOOTSTRAP_BATCH_VALUES // max(nb_qas, 1))
+    filled: np.ndarray = np.where(valid, values, 0.0)
+    weights_valid: np.ndarray = valid.astype(np.float64)
+    res: list[np.ndarray] = []
+    for start in range(0, n_resamples, batch):
+        size: int = min(batch, n_resamples - start)
+        draws: np.ndarray = rng.integers(0, nb_qas, size=(size, nb_qas))
+        draws += (np.arange(size) * nb_qas)[:, None]
+        counts: np.ndarray = np.bincount(draws.ravel(), minlength=size * nb_qas).reshape(size, nb_qas).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res.append((counts @ filled) / (counts @ weights_valid))
+    return np.concatenate(res) if res else np.empty((0, values.shape[1]))
+
+
+def bootstrap_ci(
+    evals: EvalArrays,
+    field: str = "auto",
+    n_resamples: int = 10_000,
+    confidence: float = 0.95,
+    baseline: Optional[str] = None,
+    seed: Optional[int] = None,
+) -> dict[str, dict[str, float]]:
+    """Paired bootstrap confidence intervals of the mean of field per model
+    The QAs are resampled n_resamples times and each model is evaluated on the same resamples - returns per model
+    "mean", "low" and "high" (percentile interval at confidence) - if baseline is a model name, also returns the
+    difference with the baseline on the QAs evaluated for both models: "diff", "diff low", "diff high" and
+    "p better", the share of resamples where the model is better than the baseline"""
+    _check_numpy()
+    if baseline is not None and baseline not in evals.models:
+        raise RagtimeException(f'Baseline model "{baseline}" not found - models: {", ".join(evals.models)}')
+    if not evals.nb_qas:
+        return {}
+    rng = np.random.default_rng(seed)
+    nb_models: int = len(evals.models)
+    values: np.ndarray = evals.matrix(field)
+    valid: np.ndarray = ~np.isnan(values)
+    if baseline is not None:  # the differences are resampled with the same draws as the means
+        b: int = evals.models.index(baseline)
+        both: np.ndarray = valid & valid[:, [b]]
+        values = np.hstack([values, values - values[:, [b]]])
+        valid = np.hstack([valid, both])
+    alpha: float = (1 - confidence) / 2 * 100
+    with np.errstate(invalid="ignore", divide="ignore"):
+        point: np.ndarray = np.where(valid, values, 0.0).sum(axis=0) / valid.sum(axis=0)
+    low, high = point, point
+    resampled: np.ndarray = _resampled_means(values, valid, n_resamples, rng)
+    if n_resamples:
+        low, high = np.nanpercentile(resampled, [alpha, 100 - alpha], axis=0)
+    res: dict[str, dict[str, float]] = {}
+    for m, name in enumerate(evals.models):
+        res[name] = {"mean": float(point[m]), "low": float(low[m]), "high": float(high[m]), "nb": int(valid[:, m].sum())}
+        if baseline is not None:
+            d: int = nb_models + m
+            res[name].update(
+                {
+                    "diff": float(point[d]),
+                    "diff low": float(low[d]),
+                    "diff high": float(high[d]),
+                    "p better": float(np.mean(resampled[:, d] > 0)) if n_resamples else None,
+                }
+            )
+    return res
+
+
+def iter_llm_answers(qas: Iterable) -> Iterator:
+    """Yields every LLMAnswer of the QAs: question, facts, answers and evals"""
+    for qa in qas:
+        objects: list = [qa.question, qa.facts]
+        for answer in qa.answers or []:
+            objects.extend((answer, answer.eval))
+        for obj in objects:
+            llm_answer = getattr(obj, "llm_answer", None) if obj is not None else None
+            if llm_answer:
+                yield llm_answer
+
+
+def _histogram(values: list[int], bins: int) -> dict[str, list]:
+    if not values:
+        return {"edges": [], "counts": []}
+    counts, edges = np.histogram(np.array(values, dtype=np.float64), bins=bins)
+    return {"edges": [float(e) for e in edges], "counts": [int(c) for c in counts]}
+
+
+def _token_stats(calls: list[tuple], bins: int) -> dict:
+    """calls: (prompt_tokens, completion_tokens, duration, cost) of the LLMAnswers"""
+    prompt_tokens: list[int] = [c[0] for c in calls if c[0] is not None]
+    completion_tokens: list[int] = [c[1] for c in calls if c[1] is not None]
+    timed: list[tuple] = [c for c in calls if c[1] is not None and c[2]]
+    duration: float = sum(c[2] for c in timed)
+    return {
+        "calls": len(calls),
+        "prompt tokens": sum(prompt_tokens),
+        "completion tokens": sum(completion_tokens),
+        "mean prompt tokens": float(np.mean(prompt_tokens)) if prompt_tokens else None,
+        "mean completion tokens": float(np.mean(completion_tokens)) if completion_tokens else None,
+        "completion tokens/s": sum(c[1] for c in timed) / duration if duration else None,
+        "cost": sum(c[3] for c in calls if c[3]),
+        "prompt tokens histogram": _histogram(prompt_tokens, bins),
+        "completion tokens histogram": _histogram(completion_tokens, bins),
+    }
+
+
+def is_reused(llm_answer) -> bool:
+    """True if the LLMAnswer has not been generated by its own call to the provider: taken from the LLMCache or copied
+    from an identical call in flight"""
+    return bool(llm_answer.meta.get("cache_hit") or llm_answer.meta.get("coalesced"))
+
+
+def token_report(qas: Iterable, bins: int = 10, period: float = 3600) -> dict:
+    """Token usage of the LLM calls of the QAs (questions, facts, answers and evals):
+    - "per model" and "per prompter": number of calls, total and mean prompt and completion tokens, completion tokens
+    per second of LLM time, cost and the histograms of the prompt and completion tokens (bins edges and counts)
+    - "throughput": per period of period seconds (based on LLMAnswer.timestamp), the start of the period, the number
+    of calls and the prompt and completion tokens per second
+    - "reused" per model: number of answers, prompt and completion tokens and original cost (i.e. saved) of the answers
+    taken from the cache or from an identical call in flight - they are not counted in the other sections since they
+    cost no provider call"""
+    _check_numpy()
+    per_model: dict[str, list[tuple]] = {}
+    per_prompter: dict[str, list[tuple]] = {}
+    periods: dict[int, list[int]] = {}
+    reused: dict[str, dict] = {}
+    for llm_answer in iter_llm_answers(qas):
+        if is_reused(llm_answer):
+            totals: dict = reused.setdefault(llm_answer.name or "?", {"calls": 0, "prompt tokens": 0, "completion tokens": 0, "cost": 0.0})
+            totals["calls"] += 1
+            totals["prompt tokens"] += llm_answer.prompt_tokens or 0
+            totals["completion tokens"] += llm_answer.completion_tokens or 0
+            totals["cost"] += llm_answer.meta.get("original_cost", llm_answer.cost) or 0.0
+            continue
+        call: tuple = (llm_answer.prompt_tokens, llm_answer.completion_tokens, llm_answer.duration, llm_answer.cost)
+        per_model.setdefault(llm_answer.name or "?", []).append(call)
+        prompter: str = (llm_answer.prompt.prompter if llm_answer.prompt else None) or "?"
+        per_prompter.setdefault(prompter, []).append(call)
+        if isinstance(llm_answer.timestamp, datetime):  # the default value is not a datetime
+            counts: list[int] = periods.setdefault(int(llm_answer.timestamp.timestamp() // period), [0, 0, 0])
+            counts[0] += 1
+            counts[1] += llm_answer.prompt_tokens or 0
+            counts[2] += llm_answer.completion_tokens or 0
+    return {
+        "per model": {name: _token_stats(calls, bins) for name, calls in per_model.items()},
+        "per prompter": {name: _token_stats(calls, bins) for name, calls in per_prompter.items()},
+        "throughput": [
+            {
+                "start": datetime.fromtimestamp(num * period),
+                "calls": counts[0],
+                "prompt tokens/s": counts[1] / period,
+                "completion tokens/s": counts[2] / period,
+            }
+            for num, counts in sorted(periods.items())
+        ],
+        "reused": reused,
+    }
@@ -0,0 +1,123 @@
+"""
+HTML export of Expe
+- the Jinja environments are cached per template folder, so the templates are compiled once and recompiled only when
+their file changes
+- the reports are streamed to the file with Template.generate instead of being rendered in one string
+- a report can be split into pages of page_size QAs with an index page linking to the pages
+- the chunks can be written in a side JavaScript file per page, loaded only when the user asks to show them
+"""
+
+from jinja2 import Environment, FileSystemLoader, Template
+
+from pathlib import Path
+from typing import Any, Iterable, Optional, TextIO
+import json
+
+_ENVIRONMENTS: dict[Path, Environment] = {}
+_STRING_TEMPLATES: dict[str, Template] = {}
+
+_INDEX_TEMPLATE: str = """<html>
+<head>
+  <meta charset="utf-8">
+  <style>
+    * { font-family: Arial }
+    td { padding: 3px 10px; border-bottom: 1px solid #ccc; }
+  </style>
+</head>
+<body>
+  <span style="font-size: 20px;">{{ report_name }}</span> - {{ nb_qas }} questions
+  <table>
+    {% for page in pages %}
+      <tr>
+        <td><a href="{{ page.file }}">Page {{ page.number }}</a></td>
+        <td>Questions {{ page.first }} to {{ page.last }}</td>
+        <td><i>{{ page.question }}</i></td>
+      </tr>
+    {% endfor %}
+  </table>
+</body>
+</html>
+"""
+
+# Used for the side files if the template does not define a "render_chunks" macro
+_CHUNKS_TEMPLATE: str = """{% macro render_chunks(chunks) %}
+<table>
+  {% for chunk in chunks %}
+    <tr><td><span class="model_name">Chunk_{{ loop.index }}</span> &nbsp; {{ chunk.text }}<br /><br /></td></tr>
+  {% endfor %}
+</table>
+{% endmacro %}"""
+
+
+def get_template(template_path: Path) -> Template:
+    """Returns the compiled template - one Jinja environment is kept per template folder"""
+    template_path = Path(template_path)
+    folder: Path = template_path.parent.resolve()
+    environment: Optional[Environment] = _ENVIRONMENTS.get(folder)
+    if not environment:
+        environment = _ENVIRONMENTS[folder] = Environment(loader=FileSystemLoader(searchpath=folder, encoding="utf-8"))
+    return environment.get_template(template_path.name)
+
+
+def _string_template(source: str) -> Template:
+    """Returns the compiled template of a source string - compiled once"""
+    if source not in _STRING_TEMPLATES:
+        _STRING_TEMPLATES[source] = Environment().from_string(source)
+    return _STRING_TEMPLATES[source]
+
+
+def _chunks_macro(template: Template):
+    """Returns the macro rendering the chunks of a QA - the "render_chunks" macro of the template if any"""
+    return getattr(template.module, "render_chunks", None) or _string_template(_CHUNKS_TEMPLATE).module.render_chunks
+
+
+def stream_template(template: Template, context: dict, path: Path):
+    """Writes the rendered template to path as it is generated"""
+    with open(path, mode="w", encoding="utf-8") as file:
+        file.writelines(template.generate(context))
+
+
+def _js_string(s: str) -> str:
+    return json.dumps(s).replace("</", "<\\/")
+
+
+def _write_chunks(qas: Iterable, first_index: int, chunks_macro, file: TextIO):
+    """Writes the HTML of the chunks of the QAs in the side file, keyed by their index in the Expe"""
+    file.write("ragtimeSetChunks({\n")
+    for i, qa in enumerate(qas, start=first_index):
+        file.write(f'"{i}": {_js_string(str(chunks_macro(qa.chunks or [])))},\n')
+    file.write("});\n")
+
+
+def write_page(template: Template, context: dict, expe, qas: Iterable, path: Path, first_index: int = 0,
+               b_lazy_chunks: bool = False):
+    """Writes the QAs to the HTML page - the chunks go to the side file "<page>.chunks.js" if b_lazy_chunks
+    The template gets the Expe as "expe" and the QAs of the page as "qas" - qas must be iterable several times (the Expe
+    itself or a list) as the chunks are written in a first pass when b_lazy_chunks
+    first_index is the index in the Expe of the first QA of the page"""
+    context = {**context, "expe": expe, "qas": qas, "index_offset": first_index}
+    if b_lazy_chunks:
+        chunks_path: Path = path.with_name(f"{path.stem}.chunks.js")
+        with open(chunks_path, mode="w", encoding="utf-8") as chunks_file:
+            _write_chunks(qas, first_index, _chunks_macro(template), chunks_file)
+        context["chunks_file"] = chunks_path.name
+    stream_template(template, context, path)
+
+
+def write_index(path: Path, report_name: str, pages: list[dict[str, Any]], nb_qas: int):
+    """Writes the index page - pages have the keys file, number, first, last and question"""
+    stream_template(_string_template(_INDEX_TEMPLATE), {"report_name": report_name, "pages": pages, "nb_qas": nb_qas}, path)
+
+
+def page_links(path: Path, number: int, nb_pages: int) -> dict[str, Optional[str]]:
+    """Returns the file names of the index, previous and next pages, for the navigation in the pages"""
+    return {
+        "index_page": path.name,
+        "previous_page": page_path(path, number - 1, nb_pages).name if number > 1 else None,
+        "next_page": page_path(path, number + 1, nb_pages).name if number < nb_pages else None,
+    }
+
+
+def page_path(path: Path, number: int, nb_pages: int) -> Path:
+    """Path of the page number (starts at 1) of a report saved as path"""
+    return path.with_name(f"{path.stem}_p{number:0{len(str(nb_pages))}d}{path.suffix}")
@@ -0,0 +1,479 @@
+"""
+Low level input / output for Expe files
+The JSON files are scanned without being fully parsed: only the position of each QA in the file is computed
+and a QA is parsed when needed. This allows to stop early (n_first) and to load QAs lazily.
+The chunks are saved once in a chunk table and referenced by id in the QAs, since the same chunks are usually
+retrieved for many questions.
+"""
+
+from ragtime.base import RagtimeException
+
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+import gzip
+import hashlib
+import json
+import mmap
+import re
+import weakref
+
+# Optional dependencies: orjson is used instead of json if installed, zstandard is needed for ".json.zst" files
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Extensions of the Expe JSON files - the compression is chosen by the extension
+JSON_EXTENSIONS: tuple[str, ...] = (".json.gz", ".json.zst", ".json")
+# Extensions of the Expe SQLite databases
+SQLITE_EXTENSIONS: tuple[str, ...] = (".sqlite", ".db")
+# Extension added to the name of an Expe file for its stats sidecar file
+STATS_EXTENSION: str = ".stats"
+
+_STRUCT_RE = re.compile(rb'["\[\]{}]')
+_STRING_END_RE = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_WS_RE = re.compile(rb"\s*")
+_PRIMITIVE_RE = re.compile(rb"[^,\]}\s]+")
+
+Buffer = Union[bytes, mmap.mmap]
+Span = tuple[int, int]
+
+
+def _skip_ws(buf: Buffer, pos: int) -> int:
+    return _WS_RE.match(buf, pos).end()
+
+
+def _string_end(buf: Buffer, pos: int) -> int:
+    """pos is just after the opening quote - returns the position after the closing quote"""
+    m = _STRING_END_RE.match(buf, pos)
+    if not m:
+        raise ValueError(f"Unterminated string in JSON at position {pos}")
+    return m.end()
+
+
+def _value_end(buf: Buffer, pos: int) -> int:
+    """Returns the position just after the JSON value starting at pos"""
+    c: bytes = buf[pos : pos + 1]
+    if c == b'"':
+        return _string_end(buf, pos + 1)
+    if c in (b"{", b"["):
+        depth: int = 0
+        while True:
+            m = _STRUCT_RE.search(buf, pos)
+            if not m:
+                raise ValueError("Unexpected end of JSON")
+            ch: bytes = m.group()
+            pos = m.end()
+            if ch == b'"':
+                pos = _string_end(buf, pos)
+            elif ch in (b"{", b"["):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return pos
+    m = _PRIMITIVE_RE.match(buf, pos)
+    if not m:
+        raise ValueError(f"Invalid JSON value at position {pos}")
+    return m.end()
+
+
+def _iter_array(buf: Buffer, pos: int) -> Iterator[Span]:
+    """pos is on the opening bracket - yields the span of each element and returns the position after the array"""
+    pos = _skip_ws(buf, pos + 1)
+    if buf[pos : pos + 1] == b"]":
+        return pos + 1
+    while True:
+        end: int = _value_end(buf, pos)
+        yield pos, end
+        pos = _skip_ws(buf, end)
+        c: bytes = buf[pos : pos + 1]
+        if c == b"]":
+            return pos + 1
+        if c != b",":
+            raise ValueError(f"Expected ',' or ']' in JSON at position {pos}")
+        pos = _skip_ws(buf, pos + 1)
+
+
+def scan_expe(buf: Buffer, n_first: int = 0) -> tuple[dict[str, Span], list[Span]]:
+    """
+    Scans an Expe JSON document, either a list of QAs or an object with an "items" list of QAs
+    Returns the spans of the top level values other than "items" (e.g. "meta") and the spans of the QAs
+    Only the n_first QAs are returned if n_first > 0 and the scan stops after them
+    """
+    top_level: dict[str, Span] = {}
+    items: list[Span] = []
+
+    def _read_items(pos: int) -> Optional[int]:
+        """Reads the QAs spans - returns the position after the array, None if stopped after n_first QAs"""
+        array = _iter_array(buf, pos)
+        try:
+            while True:
+                items.append(next(array))
+                if n_first and len(items) == n_first:
+                    return None
+        except StopIteration as stop:
+            return stop.value
+
+    pos: int = _skip_ws(buf, 0)
+    if buf[pos : pos + 1] == b"[":
+        _read_items(pos)
+        return top_level, items
+    if buf[pos : pos + 1] != b"{":
+        raise ValueError("An Expe JSON file must contain a list or an object")
+    pos = _skip_ws(buf, pos + 1)
+    while buf[pos : pos + 1] != b"}":
+        key_end: int = _string_end(buf, pos + 1)
+        key: str = json.loads(buf[pos:key_end])
+        pos = _skip_ws(buf, key_end)
+        if buf[pos : pos + 1] != b":":
+            raise ValueError(f"Expected ':' in JSON at position {pos}")
+        pos = _skip_ws(buf, pos + 1)
+        if key == "items" and buf[pos : pos + 1] == b"[":
+            end: Optional[int] = _read_items(pos)
+            if end is None:  # values written after the items (none in files saved by Ragtime) are not read
+                break
+        else:
+            end: int = _value_end(buf, pos)
+            top_level[key] = (pos, end)
+        pos = _skip_ws(buf, end)
+        if buf[pos : pos + 1] == b",":
+            pos = _skip_ws(buf, pos + 1)
+    return top_level, items
+
+
+class ExpeFileBuffer:
+    """Read-only buffer on an Expe file - memory-mapped so that the file is not loaded in memory
+    Compressed files are decompressed in memory"""
+
+    def __init__(self, path: Path):
+        self.path: Path = Path(path)
+        self._file = None
+        if _compression(self.path):
+            self.buf: Buffer = read_bytes(self.path)
+            return
+        self._file = open(self.path, mode="rb")
+        try:
+            self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file cannot be mapped
+            self.buf = b""
+
+    def parse(self, span: Span):
+        return loads(self.buf[span[0] : span[1]])
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.buf = b""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def _closed_source(key):
+    raise RagtimeException("The file of the Expe has been closed - the QAs not loaded yet cannot be read")
+
+
+class LazyItems:
+    """Items, e.g. the QAs of an Expe, loaded only when accessed - loaded items are kept since they may be modified
+    Each item has a key, e.g. its span in a JSON file, given to load_item to load it - a key can also be a function
+    returning the item, e.g. to load it from a journal
+    Once persisted, items can be released: they are then only weakly referenced and loaded again if needed, so that
+    going through every item does not keep them all in memory"""
+
+    def __init__(self, keys: list, load_item: Callable, close: Optional[Callable] = None):
+        self.keys: list = keys
+        self.load_item: Callable = load_item
+        self.close: Optional[Callable] = close  # called to release the source once every item is loaded
+        self.loaded: dict[int, object] = {}
+        self.released: dict[int, weakref.ref] = {}  # items released but maybe still used elsewhere
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += len(self.keys)
+        if not 0 <= index < len(self.keys):
+            raise IndexError("Expe index out of range")
+        return index
+
+    def __getitem__(self, index: int):
+        index = self._index(index)
+        item: Optional[object] = self.loaded.get(index)
+        if item is None:
+            ref: Optional[weakref.ref] = self.released.pop(index, None)
+            item = ref() if ref else None
+            if item is None:
+                key = self.keys[index]
+                item = key() if callable(key) else self.load_item(key)
+            self.loaded[index] = item
+        return item
+
+    def __setitem__(self, index: int, item):
+        if index < 0:
+            index += len(self.keys)
+        self.released.pop(index, None)
+        self.loaded[index] = item
+
+    def peek(self, index: int):
+        """Returns the item if it is in memory, None otherwise - it is not loaded"""
+        item: Optional[object] = self.loaded.get(index)
+        if item is None and index in self.released:
+            item = self.released[index]()
+        return item
+
+    def load(self, index: int):
+        """Returns the item, loading it if it is not in memory - the item loaded is not kept"""
+        item: Optional[object] = self.peek(index)
+        if item is None:
+            key = self.keys[index]
+            item = key() if callable(key) else self.load_item(key)
+        return item
+
+    def in_memory(self) -> Iterator[tuple[int, object]]:
+        """Yields (index, item) for the items in memory, i.e. loaded and not released or still used elsewhere"""
+        yield from list(self.loaded.items())
+        for index, ref in list(self.released.items()):
+            item: Optional[object] = ref()
+            if item is not None:
+                yield index, item
+
+    def release(self, index: int, key=None):
+        """Releases the item once it has been persisted so that it can be loaded again - key replaces its key if given,
+        e.g. a function loading it from where it has been persisted
+        An item without key, i.e. added to the items and never persisted, cannot be released"""
+        if key is not None:
+            self.keys[index] = key
+        item: Optional[object] = self.loaded.get(index)
+        if item is not None and self.keys[index] is not None:
+            del self.loaded[index]
+            self.released[index] = weakref.ref(item)
+
+    def release_all(self):
+        """Releases every loaded item, e.g. once they have all been saved"""
+        for index in list(self.loaded):
+            self.release(index)
+
+    def close_source(self):
+        """Releases the source - the items not in memory can no longer be loaded"""
+        if self.close:
+            self.close()
+        self.load_item = _closed_source
+
+    def to_list(self) -> list:
+        """Returns every item, loading the ones not loaded yet, and releases the source"""
+        result: list = [self[i] for i in range(len(self.keys))]
+        if self.close:
+            self.close()
+        return result
+
+
+def split_ext(path: Path) -> tuple[str, str]:
+    """Returns the file name without its extension and the extension - ".json.gz" and ".json.zst" are single extensions"""
+    name: str = Path(path).name
+    for ext in JSON_EXTENSIONS:
+        if name.lower().endswith(ext) and len(name) > len(ext):
+            return name[: -len(ext)], name[-len(ext) :]
+    suffix: str = Path(name).suffix
+    return name[: len(name) - len(suffix)], suffix
+
+
+def is_expe_file(path: Path) -> bool:
+    """True if path is a file with an Expe extension, i.e. JSON compressed or not, or SQLite"""
+    return Path(path).is_file() and split_ext(path)[1].lower() in JSON_EXTENSIONS + SQLITE_EXTENSIONS
+
+
+def is_sqlite_path(path: Path) -> bool:
+    return split_ext(path)[1].lower() in SQLITE_EXTENSIONS
+
+
+def loads(data: Union[bytes, str]):
+    """Parses JSON with orjson if installed, json otherwise"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def dumps(obj, b_indent: bool = False) -> bytes:
+    """Serializes obj to UTF-8 JSON with orjson if installed, json otherwise
+    b_indent = True to indent the JSON, e.g. to debug - it makes the files bigger and slower to write"""
+    if orjson:
+        option: int = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if b_indent else 0)
+        return orjson.dumps(obj, option=option)
+    if b_indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _compression(path: Path) -> Optional[str]:
+    ext: str = split_ext(path)[1].lower()
+    if ext == ".json.gz":
+        return "gzip"
+    if ext == ".json.zst":
+        if not zstandard:
+            raise RagtimeException(f'Package "zstandard" is needed to read and write "{Path(path).name}" - run "pip install zstandard"')
+        return "zstd"
+    return None
+
+
+def read_bytes(path: Path) -> bytes:
+    """Returns the content of the file, decompressed according to its extension"""
+    compression: Optional[str] = _compression(path)
+    data: bytes = Path(path).read_bytes()
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        with zstandard.ZstdDecompressor().stream_reader(data) as reader:  # frames may not store their content size
+            return reader.read()
+    return data
+
+
+def open_to_write(path: Path):
+    """Returns a binary file to write path by parts, compressed according to its extension"""
+    compression: Optional[str] = _compression(path)
+    if compression == "gzip":
+        return gzip.open(path, mode="wb", compresslevel=6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, mode="wb"))
+    return open(path, mode="wb")
+
+
+def write_bytes(path: Path, data: bytes):
+    """Writes the data in the file, compressed according to its extension"""
+    compression: Optional[str] = _compression(path)
+    if compression == "gzip":
+        data = gzip.compress(data, compresslevel=6)
+    elif compression == "zstd":
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+    Path(path).write_bytes(data)
+
+
+def stats_path(path: Path) -> Path:
+    """Path of the sidecar file of an Expe file, where its stats are saved, e.g. "name.json.stats" """
+    path = Path(path)
+    return path.with_name(f"{path.name}{STATS_EXTENSION}")
+
+
+def _file_signature(path: Path) -> list[int]:
+    """Modification time and size of the Expe file, and of its WAL file for SQLite if it is not empty, i.e. if it has
+    content not checkpointed yet - an empty or deleted WAL file does not change the signature"""
+    files: list[Path] = [path, path.with_name(f"{path.name}-wal")] if is_sqlite_path(path) else [path]
+    stats: list = [f.stat() for f in files if f.is_file()]
+    return [v for i, st in enumerate(stats) if i == 0 or st.st_size for v in (st.st_mtime_ns, st.st_size)]
+
+
+def write_stats(path: Path, stats: dict):
+    """Writes the stats of the Expe saved in path in its sidecar file - to be called once the Expe file is written"""
+    path = Path(path)
+    try:
+        stats_path(path).write_bytes(dumps({"signature": _file_signature(path), "stats": stats}))
+    except OSError:  # the stats are only a cache
+        pass
+
+
+def read_stats(path: Path) -> Optional[dict]:
+    """Returns the stats saved in the sidecar file of the Expe file, or None if the Expe file has changed since"""
+    path = Path(path)
+    try:
+        data: dict = loads(stats_path(path).read_bytes())
+    except (OSError, ValueError):
+        return None
+    return data.get("stats") if data.get("signature") == _file_signature(path) else None
+
+
+def question_fingerprint(text: str) -> str:
+    """Stable id of a question, used to match the QAs of different Expes - the case and the whitespaces are ignored"""
+    normalised: str = " ".join(str(text or "").split()).lower()
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id(chunk: dict) -> str:
+    """Content hash of a chunk given as {"text": ..., "meta": {...}} - used as its id in the chunk table"""
+    as_str: str = json.dumps(chunk, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(as_str.encode("utf-8")).hexdigest()[:16]
+
+
+def _llm_answers(json_qa: dict) -> Iterator[dict]:
+    """Yields the LLMAnswers in a QA as dicts"""
+    objs: list = [json_qa.get("question"), json_qa.get("facts")]
+    for answer in (json_qa.get("answers") or {}).get("items", []):
+        objs += [answer, answer.get("eval")]
+    for obj in objs:
+        if obj and obj.get("llm_answer"):
+            yield obj["llm_answer"]
+
+
+CHUNK_REF: str = "$chunk"  # key of the references to the chunk table
+
+
+def is_chunk_ref(value) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and isinstance(value.get(CHUNK_REF), str)
+
+
+class ChunkTable:
+    """
+    Chunks of an Expe file stored once and referenced by their id in the QAs
+    When saving, the chunks in QA.chunks and LLMAnswer.chunks are replaced with a reference {"$chunk": id}
+    When loading, the references are replaced with one shared object per id, i.e. one Chunk for QA.chunks and one dict for
+    LLMAnswer.chunks - so modifying a chunk in a QA modifies it in every QA it appears in
+    """
+
+    def __init__(self, table: dict[str, dict] = None, make_chunk=None, fetch: Optional[Callable] = None):
+        self.table: dict[str, dict] = table or {}
+        self.make_chunk = make_chunk  # function converting a dict from the table into a Chunk
+        self.fetch: Optional[Callable] = fetch  # function returning a chunk not in the table, e.g. read from a database
+        self._chunks: dict[str, object] = {}
+        self._dicts: dict[str, dict] = {}
+
+    def add(self, chunk: dict) -> dict:
+        """Adds a chunk {"text": ..., "meta": {...}} if not already in the table and returns its reference"""
+        key: str = chunk_id(chunk)
+        self.table.setdefault(key, chunk)
+        return {CHUNK_REF: key}
+
+    def ref_qa(self, json_qa: dict) -> dict:
+        """Replaces the chunks with their ids in a QA dumped as a dict"""
+        if json_qa.get("chunks"):
+            json_qa["chunks"]["items"] = [self.add(c) for c in json_qa["chunks"]["items"]]
+        for llm_answer in _llm_answers(json_qa):
+            if llm_answer.get("chunks"):
+                llm_answer["chunks"] = [self._ref_dict(c) for c in llm_answer["chunks"]]
+        return json_qa
+
+    def _ref_dict(self, chunk):
+        """LLMAnswer chunks are dicts with the text and the meta at the same level - other values are kept as is"""
+        if not (isinstance(chunk, dict) and isinstance(chunk.get("text"), str) and "meta" not in chunk):
+            return chunk
+        return self.add({"text": chunk["text"], "meta": {k: v for k, v in chunk.items() if k != "text"}})
+
+    def get(self, key: str) -> dict:
+        if key not in self.table and self.fetch:
+            chunk: Optional[dict] = self.fetch(key)
+            if chunk is not None:
+                self.table[key] = chunk
+        if key not in self.table:
+            raise ValueError(f'Chunk "{key}" not found in the chunk table')
+        return self.table[key]
+
+    def resolve_qa(self, json_qa: dict) -> dict:
+        """Replaces the chunk ids with the shared chunks in a QA loaded as a dict"""
+        if json_qa.get("chunks"):
+            json_qa["chunks"]["items"] = [self._resolve_chunk(c[CHUNK_REF]) if is_chunk_ref(c) else c for c in json_qa["chunks"]["items"]]
+        for llm_answer in _llm_answers(json_qa):
+            if llm_answer.get("chunks"):
+                llm_answer["chunks"] = [self._resolve_dict(c[CHUNK_REF]) if is_chunk_ref(c) else c for c in llm_answer["chunks"]]
+        return json_qa
+
+    def _resolve_chunk(self, key: str):
+        if key not in self._chunks:
+            self._chunks[key] = self.make_chunk(self.get(key))
+        return self._chunks[key]
+
+    def _resolve_dict(self, key: str) -> dict:
+        if key not in self._dicts:
+            chunk: dict = self.get(key)
+            self._dicts[key] = {"text": chunk["text"], **chunk.get("meta", {})}
+        return self._dicts[key]
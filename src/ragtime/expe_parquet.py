@@ -0,0 +1,238 @@
+"""
+Columnar export of Expe files for analytics, with Parquet files readable with pyarrow, pandas, polars, DuckDB...
+The JSON file stays the source of truth: the Parquet files cannot be converted back into an Expe
+
+An Expe saved as "name.parquet" gives 3 files, one per table:
+- "name.answers.parquet", one row per Answer:
+    qa_index (int32), question (string), answer_index (int32),
+    llm_name (string), llm_full_name (string), text (string), duration (float64), cost (float64), timestamp (timestamp[us]),
+    prompt_tokens (int64), completion_tokens (int64),
+    eval_text (string), eval_human (float64), eval_auto (float64), eval_llm_name (string), eval_duration (float64), eval_cost (float64),
+    meta (string, JSON of Answer.meta), eval_meta (string, JSON of Eval.meta),
+    one column "meta.<key>" / "eval_meta.<key>" per key having scalar values (bool, int, float, str) in Answer.meta / Eval.meta
+- "name.facts.parquet", one row per Fact:
+    qa_index (int32), question (string), fact_index (int32), text (string), llm_name (string)
+- "name.chunks.parquet", one row per Chunk in a QA:
+    qa_index (int32), question (string), chunk_index (int32), chunk_id (string, same id as in the JSON chunk table),
+    text (string), meta (string, JSON of Chunk.meta) and one column "meta.<key>" per key having scalar values
+The type of a "meta.<key>" column is the type of its values - int and float values give float64, other mixed types give string
+The Expe meta is stored as JSON in the "ragtime_expe_meta" key of the schema metadata of each file
+"""
+
+from ragtime.base import RagtimeException
+from ragtime.expe_io import chunk_id, split_ext
+
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PARQUET_SCHEMA_VERSION: str = "1"
+PARQUET_TABLES: tuple[str, ...] = ("answers", "facts", "chunks")
+DEFAULT_PARQUET_BATCH_SIZE: int = 1000  # number of QAs per batch written
+
+
+def _check_pyarrow():
+    if not pa:
+        raise RagtimeException('Package "pyarrow" is needed to save and load Parquet files - run "pip install pyarrow"')
+
+
+def parquet_paths(path: Path) -> dict[str, Path]:
+    """Returns the path of each table from "name.parquet" or from the path of one of the tables, e.g. "name.answers.parquet" """
+    path = Path(path)
+    name, ext = split_ext(path)
+    for table in PARQUET_TABLES:
+        if name.endswith(f".{table}"):
+            name = name[: -len(table) - 1]
+    return {table: path.parent / f"{name}.{table}.parquet" for table in PARQUET_TABLES}
+
+
+def _scalar_type(values: set) -> "pa.DataType":
+    if values == {bool}:
+        return pa.bool_()
+    if values == {int}:
+        return pa.int64()
+    if values <= {int, float}:
+        return pa.float64()
+    return pa.string()
+
+
+class _MetaColumns:
+    """Columns for the scalar values of a meta dict - types are collected over all the rows before writing,
+    so that every batch has the same schema"""
+
+    def __init__(self, prefix: str):
+        self.prefix: str = prefix
+        self.types: dict[str, set] = {}
+        self._as_str: dict[str, bool] = {}
+
+    def collect(self, meta: Optional[dict]):
+        for k, v in (meta or {}).items():
+            if isinstance(v, (bool, int, float, str)):
+                self.types.setdefault(k, set()).add(type(v))
+
+    def fields(self) -> list:
+        """Returns the columns - to be called once every row has been collected"""
+        arrow_types: dict = {k: _scalar_type(t) for k, t in self.types.items()}
+        self._as_str = {k: arrow_type == pa.string() for k, arrow_type in arrow_types.items()}
+        return [pa.field(f"{self.prefix}.{k}", arrow_type) for k, arrow_type in arrow_types.items()]
+
+    def values(self, meta: Optional[dict]) -> dict:
+        meta = meta or {}
+        result: dict = {}
+        for k, as_str in self._as_str.items():
+            v = meta.get(k)
+            if not isinstance(v, (bool, int, float, str)):
+                v = None
+            elif as_str and not isinstance(v, str):
+                v = str(v)
+            result[f"{self.prefix}.{k}"] = v
+        return result
+
+
+def _json_or_none(meta: Optional[dict]) -> Optional[str]:
+    return json.dumps(meta, ensure_ascii=False, default=str) if meta else None
+
+
+def _timestamp(llm_answer) -> Optional[datetime]:
+    value = llm_answer.timestamp if llm_answer else None
+    return value if isinstance(value, datetime) else None  # the default value is not a datetime
+
+
+def _answer_rows(qa_index: int, qa, answer_meta: _MetaColumns, eval_meta: _MetaColumns) -> Iterable[dict]:
+    for answer_index, answer in enumerate(qa.answers):
+        llm_answer = answer.llm_answer
+        ans_eval = answer.eval
+        eval_llm_answer = ans_eval.llm_answer if ans_eval else None
+        row: dict = {
+            "qa_index": qa_index,
+            "question": qa.question.text,
+            "answer_index": answer_index,
+            "llm_name": llm_answer.name if llm_answer else None,
+            "llm_full_name": llm_answer.full_name if llm_answer else None,
+            "text": answer.text,
+            "duration": llm_answer.duration if llm_answer else None,
+            "cost": llm_answer.cost if llm_answer else None,
+            "timestamp": _timestamp(llm_answer),
+            "prompt_tokens": llm_answer.prompt_tokens if llm_answer else None,
+            "completion_tokens": llm_answer.completion_tokens if llm_answer else None,
+            "eval_text": ans_eval.text if ans_eval else None,
+            "eval_human": ans_eval.human if ans_eval else None,
+            "eval_auto": ans_eval.auto if ans_eval else None,
+            "eval_llm_name": eval_llm_answer.name if eval_llm_answer else None,
+            "eval_duration": eval_llm_answer.duration if eval_llm_answer else None,
+            "eval_cost": eval_llm_answer.cost if eval_llm_answer else None,
+            "meta": _json_or_none(answer.meta),
+            "eval_meta": _json_or_none(ans_eval.meta if ans_eval else None),
+        }
+        row.update(answer_meta.values(answer.meta))
+        row.update(eval_meta.values(ans_eval.meta if ans_eval else None))
+        yield row
+
+
+def _fact_rows(qa_index: int, qa) -> Iterable[dict]:
+    llm_name: Optional[str] = qa.facts.llm_answer.name if qa.facts and qa.facts.llm_answer else None
+    for fact_index, fact in enumerate(qa.facts or []):
+        yield {"qa_index": qa_index, "question": qa.question.text, "fact_index": fact_index, "text": fact.text, "llm_name": llm_name}
+
+
+def _chunk_rows(qa_index: int, qa, chunk_meta: _MetaColumns, chunk_ids: dict[int, str]) -> Iterable[dict]:
+    for chunk_index, chunk in enumerate(qa.chunks or []):
+        # chunks loaded from a chunk table are shared by the QAs, so their id is computed once
+        cid: Optional[str] = chunk_ids.get(id(chunk))
+        if not cid:
+            cid = chunk_ids[id(chunk)] = chunk_id({"text": chunk.text, "meta": chunk.meta})
+        row: dict = {
+            "qa_index": qa_index,
+            "question": qa.question.text,
+            "chunk_index": chunk_index,
+            "chunk_id": cid,
+            "text": chunk.text,
+            "meta": _json_or_none(chunk.meta),
+        }
+        row.update(chunk_meta.values(chunk.meta))
+        yield row
+
+
+def save_to_parquet(qas: list, path: Path, expe_meta: Optional[dict] = None,
+                    batch_size: int = DEFAULT_PARQUET_BATCH_SIZE) -> dict[str, Path]:
+    """Writes the answers, facts and chunks tables of the QAs by batches of batch_size QAs
+    Returns the path of each table"""
+    _check_pyarrow()
+    paths: dict[str, Path] = parquet_paths(path)
+    answer_meta, eval_meta, chunk_meta = _MetaColumns("meta"), _MetaColumns("eval_meta"), _MetaColumns("meta")
+    for qa in qas:
+        for answer in qa.answers:
+            answer_meta.collect(answer.meta)
+            eval_meta.collect(answer.eval.meta if answer.eval else None)
+        for chunk in qa.chunks or []:
+            chunk_meta.collect(chunk.meta)
+
+    metadata: dict[str, str] = {"ragtime_schema": PARQUET_SCHEMA_VERSION, "ragtime_expe_meta": json.dumps(expe_meta or {}, default=str)}
+    schemas: dict[str, "pa.Schema"] = {
+        "answers": pa.schema(
+            [
+                ("qa_index", pa.int32()), ("question", pa.string()), ("answer_index", pa.int32()),
+                ("llm_name", pa.string()), ("llm_full_name", pa.string()), ("text", pa.string()),
+                ("duration", pa.float64()), ("cost", pa.float64()), ("timestamp", pa.timestamp("us")),
+                ("prompt_tokens", pa.int64()), ("completion_tokens", pa.int64()),
+                ("eval_text", pa.string()), ("eval_human", pa.float64()), ("eval_auto", pa.float64()),
+                ("eval_llm_name", pa.string()), ("eval_duration", pa.float64()), ("eval_cost", pa.float64()),
+                ("meta", pa.string()), ("eval_meta", pa.string()),
+            ]
+            + answer_meta.fields()
+            + eval_meta.fields(),
+            metadata=metadata,
+        ),
+        "facts": pa.schema(
+            [("qa_index", pa.int32()), ("question", pa.string()), ("fact_index", pa.int32()), ("text", pa.string()), ("llm_name", pa.string())],
+            metadata=metadata,
+        ),
+        "chunks": pa.schema(
+            [("qa_index", pa.int32()), ("question", pa.string()), ("chunk_index", pa.int32()), ("chunk_id", pa.string()),
+             ("text", pa.string()), ("meta", pa.string())]
+            + chunk_meta.fields(),
+            metadata=metadata,
+        ),
+    }
+
+    writers: dict[str, "pq.ParquetWriter"] = {t: pq.ParquetWriter(paths[t], schemas[t]) for t in PARQUET_TABLES}
+    rows: dict[str, list[dict]] = {t: [] for t in PARQUET_TABLES}
+    chunk_ids: dict[int, str] = {}
+
+    def flush():
+        for t in PARQUET_TABLES:
+            if rows[t]:
+                writers[t].write_table(pa.Table.from_pylist(rows[t], schema=schemas[t]))
+                rows[t] = []
+
+    try:
+        for qa_index, qa in enumerate(qas):
+            rows["answers"].extend(_answer_rows(qa_index, qa, answer_meta, eval_meta))
+            rows["facts"].extend(_fact_rows(qa_index, qa))
+            rows["chunks"].extend(_chunk_rows(qa_index, qa, chunk_meta, chunk_ids))
+            if (qa_index + 1) % batch_size == 0:
+                flush()
+        flush()
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return paths
+
+
+def load_from_parquet(path: Path) -> dict[str, "pa.Table"]:
+    """Returns the answers, facts and chunks tables as pyarrow Tables - the files are memory-mapped
+    path can be "name.parquet" or the path of one of the tables, e.g. "name.answers.parquet" """
+    _check_pyarrow()
+    paths: dict[str, Path] = parquet_paths(path)
+    missing: list[str] = [p.name for p in paths.values() if not p.is_file()]
+    if missing:
+        raise RagtimeException(f"Parquet files not found: {', '.join(missing)}")
+    return {t: pq.read_table(p, memory_map=True) for t, p in paths.items()}
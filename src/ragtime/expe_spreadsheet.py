@@ -0,0 +1,196 @@
+"""
+Fast spreadsheet export
+The template is loaded and saved once with openpyxl, so that everything but the data rows (other worksheets, charts,
+defined names, conditional formatting...) is written as in the standard export. The rows of the Expe worksheet are
+then streamed as XML into the saved file, without creating an openpyxl cell per value - the style of each column and
+the formulas are computed once from the configuration row of the template
+"""
+
+from ragtime.base import RagtimeException
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.compat import safe_string
+from openpyxl.utils import column_index_from_string, get_column_letter
+from xml.sax.saxutils import escape
+from xml.etree import ElementTree
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+import math
+import os
+import re
+import tempfile
+import zipfile
+
+_ROW_RE = re.compile(r"<row\b([^>]*?)\s*(?:/>|>(.*?)</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b([^>]*?)\s*(?:/>|>(.*?)</c>)", re.S)
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_SHEET_DATA_RE = re.compile(r"<sheetData\s*/>|<sheetData>(.*?)</sheetData>", re.S)
+_DIMENSION_RE = re.compile(r"<dimension\b[^>]*/>")
+_CELL_REF_RE = re.compile(r"[A-Z]+[0-9]+")
+_NS_MAIN: str = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL: str = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL: str = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def convert_value(v: Any) -> Any:
+    """Standard conversions before writing a value in a cell"""
+    if isinstance(v, list):
+        return str(v)
+    if isinstance(v, datetime):
+        return v.strftime("%d/%m/%Y %H:%M:%S")
+    if isinstance(v, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", v)  # remove illegal characters
+    return v
+
+
+def formula_template(formula: str, conf_row: int) -> str:
+    """Returns the formula as a format string with a {row} field - the cell references on the configuration row
+    are adjusted to the row the formula is written in"""
+    return _CELL_REF_RE.sub(
+        lambda m: m.group().replace(str(conf_row), "{row}"),
+        formula.replace("{", "{{").replace("}", "}}"),
+    )
+
+
+def _cell_xml(ref: str, value: Any, style: Optional[str]) -> str:
+    s: str = f' s="{style}"' if style else ""
+    if value is None:
+        return f'<c r="{ref}"{s}/>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s} t="n"><v>{safe_string(value)}</v></c>'
+    value = str(value)
+    if value == "":
+        return f'<c r="{ref}"{s} t="inlineStr"/>'
+    if value.startswith("=") and len(value) > 1:  # formula, as done by openpyxl
+        return f'<c r="{ref}"{s}><f>{escape(value[1:])}</f><v/></c>'
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def _sheet_part(zin: zipfile.ZipFile, sheet_name: str) -> str:
+    """Returns the name of the XML file of the worksheet in the xlsx file"""
+    workbook = ElementTree.fromstring(zin.read("xl/workbook.xml"))
+    sheet = next((s for s in workbook.iter(f"{_NS_MAIN}sheet") if s.get("name") == sheet_name), None)
+    if sheet is None:
+        raise RagtimeException(f'Worksheet "{sheet_name}" not found')
+    rels = ElementTree.fromstring(zin.read("xl/_rels/workbook.xml.rels"))
+    target: str = next(r.get("Target") for r in rels.iter(f"{_NS_PKG_REL}Relationship") if r.get("Id") == sheet.get(f"{_NS_REL}id"))
+    return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+
+
+class _TemplateRow:
+    """A row of the Expe worksheet as saved from the template"""
+
+    def __init__(self, attrs: str, content: Optional[str]):
+        self.attrs: str = " ".join(f'{k}="{v}"' for k, v in _ATTR_RE.findall(attrs) if k not in ("r", "spans"))
+        self.cells: dict[int, str] = {}  # column -> cell XML
+        self.styles: dict[int, str] = {}  # column -> style id
+        for m in _CELL_RE.finditer(content or ""):
+            cell_attrs: dict = dict(_ATTR_RE.findall(m.group(1)))
+            col: int = column_index_from_string(re.sub(r"\d", "", cell_attrs["r"]))
+            self.cells[col] = m.group()
+            if cell_attrs.get("s"):
+                self.styles[col] = cell_attrs["s"]
+
+    def xml(self, row: int, cells: dict[int, str]) -> str:
+        attrs: str = f" {self.attrs}" if self.attrs else ""
+        return f'<row r="{row}"{attrs}>{"".join(cells[c] for c in sorted(cells))}</row>'
+
+
+def write_rows_to_sheet(
+    path: Path,
+    sheet_name: str,
+    header_size: int,
+    template_max_row: int,
+    formulas: dict[int, str],
+    data_rows: Iterator[tuple[int, dict[int, Any]]],
+):
+    """
+    Streams the data rows into the worksheet sheet_name of the xlsx file saved from the template, as the standard export does:
+    - data_rows yields the row number and the values per column, in the order of the rows
+    - the data cells have the style of the configuration row of the template (row header_size + 1)
+    - the cells of the template not replaced by data are kept
+    - formulas (column -> formula from the configuration row) are written from the configuration row to the row before the last one
+    """
+    path = Path(path)
+    conf_row: int = header_size + 1
+    templates: dict[int, str] = {col: formula_template(f, conf_row) for col, f in formulas.items()}
+    with zipfile.ZipFile(path) as zin:
+        part: str = _sheet_part(zin, sheet_name)
+        sheet_xml: str = zin.read(part).decode("utf-8")
+    m = _SHEET_DATA_RE.search(sheet_xml)
+    prefix, suffix = sheet_xml[: m.start()], sheet_xml[m.end() :]
+    template_rows: dict[int, _TemplateRow] = {}
+    header_xml: list[str] = []
+    for row_match in _ROW_RE.finditer(m.group(1) or ""):
+        row: int = int(dict(_ATTR_RE.findall(row_match.group(1)))["r"])
+        if row <= header_size:
+            header_xml.append(row_match.group())
+        else:
+            template_rows[row] = _TemplateRow(row_match.group(1), row_match.group(2))
+    conf_styles: dict[int, str] = template_rows[conf_row].styles if conf_row in template_rows else {}
+    letters: dict[int, str] = {}
+    max_col: int = max([c for r in template_rows.values() for c in r.cells] + [1])
+    empty_row: _TemplateRow = _TemplateRow("", None)
+
+    def merged_row(row: int, data: dict[int, Any], last_row: float) -> str:
+        """Cells of the row: the template ones replaced by the data and by the formulas"""
+        template: _TemplateRow = template_rows.get(row, empty_row)
+        cells: dict[int, str] = dict(template.cells)
+        for col, value in data.items():
+            if col not in letters:
+                letters[col] = get_column_letter(col)
+            cells[col] = _cell_xml(f"{letters[col]}{row}", value, conf_styles.get(col))
+        if conf_row <= row < last_row:
+            for col, tpl in templates.items():
+                if col not in letters:
+                    letters[col] = get_column_letter(col)
+                cells[col] = _cell_xml(f"{letters[col]}{row}", tpl.format(row=row), template.styles.get(col))
+        return template.xml(row, cells)
+
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as rows_file:
+        rows_file.write("".join(header_xml))
+        written: int = header_size  # last row written
+
+        def write(row: int, data: dict[int, Any], last_row: float):
+            nonlocal written, max_col
+            for r in range(written + 1, row):  # rows between the data rows
+                if r in template_rows or (templates and conf_row <= r < last_row):
+                    rows_file.write(merged_row(r, {}, last_row))
+            rows_file.write(merged_row(row, data, last_row))
+            max_col = max([max_col] + list(data))
+            written = row
+
+        # one row lookahead since the formulas are not written in the last row
+        previous: Optional[tuple[int, dict]] = None
+        for data_row in data_rows:
+            if previous:
+                write(*previous, last_row=math.inf)
+            previous = data_row
+        last_row: int = max(template_max_row, previous[0] if previous else 0)
+        if previous:
+            write(*previous, last_row=last_row)
+        for r in range(written + 1, last_row + 1):  # template rows after the data
+            if r in template_rows or (templates and conf_row <= r < last_row):
+                rows_file.write(merged_row(r, {}, last_row))
+
+        # rebuild the xlsx file with the new worksheet
+        prefix = _DIMENSION_RE.sub(f'<dimension ref="A1:{get_column_letter(max_col)}{last_row}"/>', prefix, count=1)
+        rows_file.seek(0)
+        tmp_path: Path = path.with_name(f"{path.name}.tmp")
+        with zipfile.ZipFile(path) as zin, zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+            for item in zin.infolist():
+                if item.filename != part:
+                    zout.writestr(item, zin.read(item.filename))
+                    continue
+                with zout.open(item.filename, "w") as sheet_file:
+                    sheet_file.write(f"{prefix}<sheetData>".encode("utf-8"))
+                    while True:
+                        chunk: str = rows_file.read(1 << 20)
+                        if not chunk:
+                            break
+                        sheet_file.write(chunk.encode("utf-8"))
+                    sheet_file.write(f"</sheetData>{suffix}".encode("utf-8"))
+        os.replace(tmp_path, path)
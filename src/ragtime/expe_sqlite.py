@@ -0,0 +1,124 @@
+"""
+SQLite storage for Expe, as an alternative to JSON files when the file extension is ".sqlite" or ".db"
+One row per QA, with its index, its question (indexed) and the QA as JSON - chunks are stored once in a separate table
+as in the chunk table of the JSON files
+QAs are read one by one when accessed and only the QAs which changed are written when saving, so that checkpoints
+cost O(changed QAs) instead of O(Expe)
+"""
+
+from ragtime.base import RagtimeException
+from ragtime.expe_io import ChunkTable, dumps, loads
+
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+import hashlib
+import sqlite3
+
+SQLITE_SCHEMA_VERSION: str = "2"  # 2: chunks referenced as {"$chunk": id}
+
+
+def remove_database(path: Path):
+    """Deletes the database and its WAL files"""
+    path = Path(path)
+    for p in (path, path.with_name(f"{path.name}-wal"), path.with_name(f"{path.name}-shm")):
+        if p.is_file():
+            p.unlink()
+
+
+class ExpeStore:
+    """
+    Expe stored in a SQLite database
+    make_qa converts a QA read as a dict into a QA object and make_chunk a chunk read as a dict into a Chunk object
+    The QAs given to write are serialized and written only if their hash differs from the hash of the QA as stored -
+    the Expe only gives the QAs it has in memory, i.e. the ones accessed since the last checkpoint
+    """
+
+    def __init__(self, path: Path, make_qa: Callable = None, make_chunk: Callable = None):
+        self.path: Path = Path(path)
+        self.make_qa: Callable = make_qa
+        self._conn: sqlite3.Connection = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS qas (idx INTEGER PRIMARY KEY, question TEXT, hash TEXT NOT NULL, data BLOB NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_question ON qas(question);
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, data BLOB NOT NULL);"""
+        )
+        self._conn.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('schema', ?)", (SQLITE_SCHEMA_VERSION,))
+        self._conn.commit()
+        schema: str = self._conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()[0]
+        if schema != SQLITE_SCHEMA_VERSION:
+            self._conn.close()
+            raise RagtimeException(f'"{self.path.name}" has schema version {schema} - only version {SQLITE_SCHEMA_VERSION} can be read')
+        self.hashes: dict[int, str] = dict(self._conn.execute("SELECT idx, hash FROM qas"))
+        self.chunk_table: ChunkTable = ChunkTable(make_chunk=make_chunk, fetch=self._fetch_chunk)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _fetch_chunk(self, key: str) -> Optional[dict]:
+        row = self._conn.execute("SELECT data FROM chunks WHERE id = ?", (key,)).fetchone()
+        return loads(row[0]) if row else None
+
+    def load_meta(self) -> dict:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'expe_meta'").fetchone()
+        return loads(row[0]) if row else {}
+
+    def load_qa(self, idx: int):
+        """Returns the QA at index idx"""
+        row = self._conn.execute("SELECT data FROM qas WHERE idx = ?", (idx,)).fetchone()
+        if not row:
+            raise IndexError(f"No QA at index {idx} in {self.path.name}")
+        return self.make_qa(self.chunk_table.resolve_qa(loads(row[0])))
+
+    def find(self, question: str) -> list[int]:
+        """Returns the indexes of the QAs with this question text - uses the index on the questions"""
+        return [r[0] for r in self._conn.execute("SELECT idx FROM qas WHERE question = ? ORDER BY idx", (question,))]
+
+    def write(self, qas: Iterable[tuple[int, object]], meta: Optional[dict] = None, length: Optional[int] = None) -> int:
+        """Writes the (index, QA) given if they differ from the QAs stored, and the Expe meta
+        QAs with an index >= length are deleted if length is given
+        Returns the number of QAs written"""
+        nb_written: int = 0
+        chunk_table: ChunkTable = ChunkTable()
+        with self._conn:  # single transaction
+            for idx, qa in qas:
+                data: bytes = dumps(chunk_table.ref_qa(qa.model_dump(mode="json")))
+                qa_hash: str = hashlib.sha256(data).hexdigest()
+                if self.hashes.get(idx) == qa_hash:
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO qas(idx, question, hash, data) VALUES (?, ?, ?, ?)",
+                    (idx, qa.question.text, qa_hash, data),
+                )
+                self.hashes[idx] = qa_hash
+                nb_written += 1
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks(id, data) VALUES (?, ?)",
+                ((key, dumps(chunk)) for key, chunk in chunk_table.table.items()),
+            )
+            if meta is not None:
+                self._conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('expe_meta', ?)", (dumps(meta),))
+            if length is not None and len(self.hashes) > length:
+                self._conn.execute("DELETE FROM qas WHERE idx >= ?", (length,))
+                self.hashes = {idx: h for idx, h in self.hashes.items() if idx < length}
+        return nb_written
+
+    def checkpoint(self):
+        """Moves the content of the WAL file to the database and empties the WAL file, so that the database file alone
+        reflects the Expe - its signature then no longer changes when the connection is closed"""
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def copy_to(self, path: Path) -> "ExpeStore":
+        """Copies the database to path and returns the store of the copy"""
+        path = Path(path)
+        remove_database(path)
+        with sqlite3.connect(path) as dest:
+            self._conn.backup(dest)
+        dest.close()
+        return ExpeStore(path, make_qa=self.make_qa, make_chunk=self.chunk_table.make_chunk)
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
@@ -4,6 +4,7 @@ from ragtime.llms import LLM
 from ragtime.expe import QA, Answer, Answers, StartFrom
 from ragtime.config import logger
 from typing import Optional
+import asyncio
 
 class AnsGenerator(TextGenerator):
     """
@@ -16,15 +17,16 @@ class AnsGenerator(TextGenerator):
 
     retriever: Optional[Retriever] = None
 
-    def __init__(self, llms: list[LLM] = None, retriever: Retriever = None):
+    def __init__(self, llms: list[LLM] = None, retriever: Retriever = None, **kwargs):
         """
         Args
             retriever(Retriever): the retriever to used to get the chunks before generating the answer - can be None if no Retriever is used
             llm_names(list[str]): a list of LLM names to be instantiated as LiteLLMs - the names come from https://litellm.vercel.app/docs/providers
             llms(list[LLM]) : list of LLM objects
             Either llms or llm_names or both can be used but at least one must be provided
+            kwargs: other arguments of TextGenerator, e.g. max_concurrency, wait_between_calls or b_use_cache
         """
-        super().__init__(llms=llms)
+        super().__init__(llms=llms, **kwargs)
         if retriever:
             self.retriever = retriever
 
@@ -67,17 +69,11 @@ class AnsGenerator(TextGenerator):
             else:  # otherwise reuse the chunks already in the QA object
                 logger.info(f"Reuse existing chunks")
 
-        # Generation loop, for each LLM -> fills the Answers in the QA
+        # Generation for each LLM -> fills the Answers in the QA
         # Get list of LLMs sto actually use, if only_llms defined
-        new_answers: Answer = Answers()
         actual_llms: list[LLM] = ([l for l in self.llms if l in only_llms] if only_llms else self.llms)
 
-        original_prefix: str = logger.prefix
-
-        for llm in actual_llms:
-            # logger.prefix = f"{original_prefix}[{llm.name}]"
-            # logger.info(f"* Start with LLM")
-
+        async def _gen_for_llm(llm: LLM) -> Answer:
             # Get existing Answer if any
             prev_ans: Optional[Answer] = [a for a in qa.answers
                                           if a.llm_answer and (a.llm_answer.name == llm.name or a.llm_answer.full_name == llm.name)]
@@ -102,7 +98,11 @@ class AnsGenerator(TextGenerator):
             if prev_ans and prev_ans.eval:
                 ans.eval.human = prev_ans.eval.human
 
-            new_answers.append(ans)
+            return ans
+
+        # The LLMs are called concurrently, each one within its own limits (LLM.max_concurrency, rate limits)
+        # gather returns the Answers in the same order as the LLMs
+        new_answers: Answers = Answers(items=await asyncio.gather(*[_gen_for_llm(llm) for llm in actual_llms]))
 
-        # end of the per LLM loop, answers have been generated or retrieved, write them in qa
+        # end of the per LLM generation, answers have been generated or retrieved, write them in qa
         qa.answers = new_answers
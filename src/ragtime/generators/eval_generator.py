@@ -3,6 +3,7 @@ from ragtime.llms import LLM
 from ragtime.expe import StartFrom, QA, Eval, Facts, Answer
 from ragtime.base import RagtimeException
 from ragtime.config import logger, UNKNOWN_LLM
+import asyncio
 
 
 class EvalGenerator(TextGenerator):
@@ -32,11 +33,10 @@ class EvalGenerator(TextGenerator):
             logger.error(f"No Facts, cannot generate Evals")
             return
 
-        # Eval loop
-        for ans in (a for a in qa.answers if a.text):
+        async def _eval_answer(ans: Answer):
             llm_name: str = ans.llm_answer.name if ans.llm_answer else UNKNOWN_LLM
             if only_llms and llm_name not in only_llms and llm_name != UNKNOWN_LLM:
-                continue
+                return
             logger.debug(f'Generate Eval for answer generated with "{llm_name}"')
             prev_eval: Eval = ans.eval
 
@@ -55,6 +55,9 @@ class EvalGenerator(TextGenerator):
             if prev_eval and prev_eval.human:
                 ans.eval.human = prev_eval.human
 
+        # Answers are evaluated concurrently, within the limits of the judge LLM
+        await asyncio.gather(*[_eval_answer(a) for a in qa.answers if a.text])
+
 
 class TwoFactsEvalGenerator(TextGenerator):
     """
@@ -62,8 +65,8 @@ class TwoFactsEvalGenerator(TextGenerator):
     perform evaluation
     """
 
-    def __init__(self, llms: list[LLM] = None):
-        super().__init__(llms=llms)
+    def __init__(self, llms: list[LLM] = None, **kwargs):
+        super().__init__(llms=llms, **kwargs)
         if len(self.llms) < 2:
             raise RagtimeException(
                 """Need at least 2 LLMs to run this generator!
@@ -76,6 +79,7 @@ class TwoFactsEvalGenerator(TextGenerator):
         qa: QA,
         start_from: StartFrom = StartFrom.beginning,
         b_missing_only: bool = False,
+        only_llms: list[str] = None,
     ):
         """
         Create Eval for each QA where Facts are available
@@ -88,9 +92,10 @@ class TwoFactsEvalGenerator(TextGenerator):
             logger.error(f"No Facts, cannot generate Evals")
             return
 
-        # Eval loop
-        for ans in (a for a in qa.answers if a.text):
-            llm_name: str = (ans.llm_answer.name if ans.llm_answer else "unkown LLM (manual ?)")
+        async def _eval_answer(ans: Answer):
+            llm_name: str = ans.llm_answer.name if ans.llm_answer else UNKNOWN_LLM
+            if only_llms and llm_name not in only_llms and llm_name != UNKNOWN_LLM:
+                return
             logger.debug(f'Generate Facts for answer generated with "{llm_name}"')
             prev_eval: Eval = ans.eval
 
@@ -123,6 +128,9 @@ class TwoFactsEvalGenerator(TextGenerator):
             if prev_eval and prev_eval.human:
                 ans.eval.human = prev_eval.human
 
+        # Each Answer goes through the 2 LLMs in sequence, but the Answers are evaluated concurrently
+        await asyncio.gather(*[_eval_answer(a) for a in qa.answers if a.text])
+
 
 class EvalGeneratorChunks(TextGenerator):
     """
@@ -164,9 +172,9 @@ class EvalGeneratorChunks(TextGenerator):
             facts_hallu.append(qa.facts.items[int(elem)-1])
         for elem in ans.eval.meta["missing"]:
             facts_missing.append(qa.facts.items[int(elem)-1])
-        if len(facts_hallu) != 0:
+
+        async def _eval_facts(facts_to_eval: list, eval_name: str) -> Answer:
             ans = Answer()
-            logger.debug(f'Generate Eval for hallucination found in the answer of the question "{qa.question.text}"')
             prev_eval: Eval = ans.eval
             # 2.a. and 2.b : prompt generation + Text generation with LLM
             ans.eval = await self.llm.generate(
@@ -176,34 +184,22 @@ class EvalGeneratorChunks(TextGenerator):
                 start_from=start_from,
                 b_missing_only=b_missing_only,
                 question=qa.question,
-                facts=facts_hallu,
+                facts=facts_to_eval,
                 chunks=qa.chunks,
             )
-            ans.llm_answer = {"name": "Hallucinations Eval",
-                                         "full_name": "Hallucinations Eval"}
+            ans.llm_answer = {"name": eval_name, "full_name": eval_name}
             # save previous human eval if any
             if prev_eval and prev_eval.human:
                 ans.eval.human = prev_eval.human
-            qa.answers.append(ans)
+            return ans
+
+        evals_to_run: list = []
+        if len(facts_hallu) != 0:
+            logger.debug(f'Generate Eval for hallucination found in the answer of the question "{qa.question.text}"')
+            evals_to_run.append(_eval_facts(facts_hallu, "Hallucinations Eval"))
         if len(facts_missing) != 0:
-            ans = Answer()
             logger.debug(f'Generate Eval for the missing facts for the question "{qa.question.text}"')
-            prev_eval: Eval = ans.eval
-            # 2.a. and 2.b : prompt generation + Text generation with LLM
-            ans.eval = await self.llm.generate(
-                cur_obj=Eval(),
-                prev_obj=prev_eval,
-                qa=qa,
-                start_from=start_from,
-                b_missing_only=b_missing_only,
-                question=qa.question,
-                facts=facts_missing,
-                chunks=qa.chunks,
-            )
-            ans.llm_answer = {"name": "Missings Eval",
-                                         "full_name": "Missings Eval"}
-            # save previous human eval if any
-            if prev_eval and prev_eval.human:
-                ans.eval.human = prev_eval.human
+            evals_to_run.append(_eval_facts(facts_missing, "Missings Eval"))
+        # Both evaluations run concurrently and are appended in the same order as before (hallucinations first)
+        for ans in await asyncio.gather(*evals_to_run):
             qa.answers.append(ans)
-
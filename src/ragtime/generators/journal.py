@@ -0,0 +1,102 @@
+from ragtime.base import RagtimeBase
+from ragtime.expe import QA
+from ragtime.expe_io import split_ext
+from ragtime.config import logger
+
+from pydantic import PrivateAttr
+from pathlib import Path
+import asyncio
+import json
+import os
+import threading
+
+
+class Journal(RagtimeBase):
+    """
+    Append-only JSONL journal of the QAs completed by a TextGenerator
+    Each line contains the index of the QA in the Expe, its question before generation and the whole QA after generation
+    Every line is flushed and fsync'd so that the journal survives a crash - a line partially written is ignored
+    Replaying the journal gives back the QAs already done, so that an interrupted generation can resume without calling
+    the LLMs again for them
+    """
+
+    path: Path
+    _file = PrivateAttr(default=None)
+    _reader = PrivateAttr(default=None)  # to read back the QAs released from the Expe
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @staticmethod
+    def path_for(expe_path: Path, generator_name: str) -> Path:
+        """Journal path for an Expe file and a generator - it does not depend on the suffix added when saving
+        the Expe (e.g. "--10Q_0C_..."), so the same journal is found when running again from the same file"""
+        base_name: str = split_ext(expe_path.name.split("--")[0])[0]
+        return expe_path.parent / f"{base_name}.{generator_name}.journal.jsonl"
+
+    def replay(self) -> dict[int, dict]:
+        """Returns the entries of the journal as a dict index -> {"question": str, "offset": int} - the QA itself is
+        not kept, it is read with read_qa(offset) so that the whole journal is not loaded in memory"""
+        result: dict[int, dict] = {}
+        if not self.path.is_file():
+            return result
+        next_offset: int = 0
+        with open(self.path, mode="rb") as file:
+            for num_line, line in enumerate(file, start=1):
+                offset, next_offset = next_offset, next_offset + len(line)
+                if not line.endswith(b"\n"):
+                    logger.warning(f"Journal {self.path.name}: incomplete line {num_line} ignored")
+                    break
+                try:
+                    entry: dict = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Journal {self.path.name}: invalid line {num_line} ignored")
+                    continue
+                result[entry["index"]] = {"question": entry["question"], "offset": offset}
+        return result
+
+    def read_qa(self, offset: int) -> dict:
+        """Returns the QA of the line starting at offset, as a dict"""
+        with self._lock:
+            if not self._reader:
+                self._reader = open(self.path, mode="rb")
+            self._reader.seek(offset)
+            return json.loads(self._reader.readline())["qa"]
+
+    def _open(self):
+        if not self._file:
+            # remove a line partially written during a crash before appending new ones
+            if self.path.is_file():
+                with open(self.path, mode="rb+") as file:
+                    content: bytes = file.read()
+                    if content and not content.endswith(b"\n"):
+                        file.truncate(content.rfind(b"\n") + 1)
+            self._file = open(self.path, mode="ab")
+
+    def _write(self, line: bytes) -> int:
+        with self._lock:
+            self._open()
+            offset: int = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            return offset
+
+    async def append(self, index: int, question: str, qa: QA) -> int:
+        """Appends the QA - it is serialized in the event loop and written in a thread so as not to block the loop
+        Returns the offset of the line, to read the QA back with read_qa"""
+        line: str = json.dumps({"index": index, "question": question, "qa": qa.model_dump(mode="json")}, ensure_ascii=False) + "\n"
+        return await asyncio.get_running_loop().run_in_executor(None, self._write, line.encode("utf-8"))
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            if self._reader:
+                self._reader.close()
+                self._reader = None
+
+    def remove(self):
+        """Closes and deletes the journal, e.g. once the Expe has been compacted in its JSON file"""
+        self.close()
+        if self.path.is_file():
+            self.path.unlink()
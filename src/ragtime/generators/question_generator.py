@@ -18,9 +18,9 @@ class QuestionGenerator(TextGenerator):
     expe: Expe = Expe()
     indexer: Any = None
 
-    def __init__(self, nb_quest: int, docs_path: Path, llms: list[LLM] = None):
+    def __init__(self, nb_quest: int, docs_path: Path, llms: list[LLM] = None, **kwargs):
 
-        super().__init__(llms=llms)
+        super().__init__(llms=llms, **kwargs)
         self.nb_quest = nb_quest
         if docs_path:
             self.docs_path = docs_path
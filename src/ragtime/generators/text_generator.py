@@ -5,12 +5,14 @@ from abc import abstractmethod, ABC
 from ragtime.base import RagtimeBase
 from ragtime.expe import StartFrom, QA
 from ragtime.llms import LLM, LiteLLM
+from ragtime.llms.llm_cache import use_llm_cache
+from ragtime.generators.journal import Journal
 from ragtime.prompters.prompter import Prompter
 from ragtime.base import RagtimeException
-from ragtime.config import logger
+from ragtime.config import logger, DEFAULT_MAX_CONCURRENCY
 from ragtime.expe import Expe
 
-import time
+from pathlib import Path
 from typing import Optional
 import asyncio
 
@@ -22,12 +24,20 @@ class TextGenerator(RagtimeBase, ABC):
 
     llms: Optional[list[LLM]] = []
     b_use_chunks: bool = False
-    wait_between_calls:int = 0
+    wait_between_calls: float = 0
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    b_use_cache: bool = True  # False to bypass the LLMs' cache (if any) for this generator
 
-    def __init__(self, llms: list = None, prompter:Prompter = None, wait_between_calls:int = 0):
+    def __init__(self, llms: list = None, prompter:Prompter = None, wait_between_calls:float = 0,
+                 max_concurrency:int = DEFAULT_MAX_CONCURRENCY, b_use_cache:bool = True):
         """
         Args
             llms(LLM or list[LLM]) : list of LLM objects
+            wait_between_calls(float): seconds a worker waits after a QA before starting the next one
+            max_concurrency(int): max number of QAs processed at the same time - 0 for no limit
+            Each LLM can also limit its own number of simultaneous calls with LLM.max_concurrency
+            b_use_cache(bool): False to bypass the LLMs' cache (if any)
+        The subclasses give their other keyword arguments to this constructor
         """
         super().__init__()
         if not llms:
@@ -45,6 +55,8 @@ class TextGenerator(RagtimeBase, ABC):
             else:
                 raise RagtimeException(f'Objects in the llms list must be either str or LLM - {llm} is not')
         self.wait_between_calls = wait_between_calls
+        self.max_concurrency = max_concurrency
+        self.b_use_cache = b_use_cache
 
     @property
     def llm(self) -> LLM:
@@ -62,6 +74,7 @@ class TextGenerator(RagtimeBase, ABC):
         b_missing_only: bool = False,
         only_llms: list[str] = None,
         start_from: StartFrom = StartFrom.beginning,
+        b_journal: bool = False,
     ):
         """
         Main method calling "gen_for_qa" for each QA in an Expe. Returns False if completed with error, True otherwise
@@ -83,13 +96,39 @@ class TextGenerator(RagtimeBase, ABC):
             - only_llms: restrict the llms to be computed again - used in conjunction with start_from -
             if start from beginning, chunks or prompts, compute prompts and llm answers for the list only -
             if start from llm, recompute llm answers for these llm only - has not effect if start
+            - b_journal: True to append each completed QA to a journal file next to the Expe JSON file instead of
+            saving the whole Expe every save_every QAs - the Expe is saved once at the end and the journal deleted.
+            If the generation is interrupted, calling generate again on the same Expe file replays the journal
+            and resumes where it stopped, without calling the LLMs again for the QAs already done
+        The QAs are put in a queue consumed by max_concurrency workers, so that no more than max_concurrency
+        QAs are processed at the same time
         """
 
         nb_q: int = len(expe)
 
+        journal: Optional[Journal] = None
+        done: set[int] = set()
+        if b_journal:
+            if not expe.json_path:
+                raise RagtimeException("A journal can only be used with an Expe loaded from or saved to a JSON file")
+            if save_every:
+                logger.info("Journal is used - save_every is ignored")
+            journal = Journal(path=Journal.path_for(Path(expe.json_path), self.__class__.__name__))
+            for index, entry in journal.replay().items():
+                if index < nb_q and expe[index].question.text == entry["question"]:
+                    offset: int = entry["offset"]
+                    expe[index] = QA(**journal.read_qa(offset))
+                    expe.release(index, lambda offset=offset: QA(**journal.read_qa(offset)))
+                    done.add(index + 1)
+                else:
+                    logger.warning(f"Journal entry {index} does not match the Expe - ignored")
+            if done:
+                logger.info(f"Resume from journal {journal.path.name} - {len(done)} QAs already done")
+
         async def _generate_for_qa(num_q: int, qa: QA):
             logger.prefix = f"[{self.__class__.__name__}][{num_q}/{nb_q}]"
             logger.info(f'*** Question "{qa.question.text}"')
+            question: str = qa.question.text
             try:
                 await self.gen_for_qa(
                     qa=qa,
@@ -98,21 +137,55 @@ class TextGenerator(RagtimeBase, ABC):
                     only_llms=only_llms,
                 )
             except Exception as e:
+                expe.mark_dirty(num_q - 1)
+                if journal:  # what has been done so far is already in the journal
+                    logger.exception(f"Exception caught - skip this QA:\n{e}")
+                    return
                 logger.exception(f"Exception caught - saving what has been done so far:\n{e}")
                 expe.save_to_json()
                 expe.save_temp(name=f"Stopped_at_{num_q}_of_{nb_q}_")
                 return
-            time.sleep(self.wait_between_calls)
             logger.info(f'End question "{qa.question.text}"')
+            expe.mark_dirty(num_q - 1)  # stats may have been computed by another worker while the QA was generated
 
-            if save_every and (num_q % save_every == 0):
+            if journal:  # the QA is read back from the journal if needed, so that the Expe does not keep it
+                offset: int = await journal.append(num_q - 1, question, qa)
+                expe.release(num_q - 1, lambda: QA(**journal.read_qa(offset)))
+            elif save_every and (num_q % save_every == 0):
                 expe.save_to_json()
 
+        async def _worker(queue: asyncio.Queue):
+            while True:
+                try:
+                    num_q: int = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await _generate_for_qa(num_q, expe[num_q - 1])
+                if self.wait_between_calls:
+                    await asyncio.sleep(self.wait_between_calls)
+
+        async def _run():
+            queue: asyncio.Queue = asyncio.Queue()
+            for num_q in range(1, nb_q + 1):
+                if num_q not in done:
+                    queue.put_nowait(num_q)
+            nb_todo: int = queue.qsize()
+            nb_workers: int = min(self.max_concurrency, nb_todo) if self.max_concurrency else nb_todo
+            logger.info(f"{nb_todo} QAs to process with {nb_workers} workers")
+            await asyncio.gather(*[_worker(queue) for _ in range(nb_workers)])
+
         original_logger_prefix:str = logger.prefix
+        cache_token = use_llm_cache.set(self.b_use_cache)  # the tasks created in _run inherit this value
         loop = asyncio.get_event_loop()
-        tasks = [_generate_for_qa(num_q, qa) for num_q, qa in enumerate(expe, start=1)]
-        logger.info(f"{len(tasks)} tasks created")
-        loop.run_until_complete(asyncio.gather(*tasks))
+        try:
+            loop.run_until_complete(_run())
+        finally:
+            use_llm_cache.reset(cache_token)
+            if journal:
+                journal.close()
+        if journal:  # compact the journal into the Expe file
+            expe.save_to_json()
+            journal.remove()
         logger.prefix = original_logger_prefix
 
     def write_chunks(self, qa: QA):
@@ -1,2 +1,6 @@
 from ragtime.llms.lite_llm import *
-from ragtime.llms.llm import *
\ No newline at end of file
+from ragtime.llms.llm import *
+from ragtime.llms.llm_cache import *
+from ragtime.llms.rate_limiter import *
+from ragtime.llms.single_flight import *
+from ragtime.llms.routed_llm import *
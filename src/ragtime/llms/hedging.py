@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import time
+
+# Number of latencies kept per model to compute the hedging delay, and minimum number needed to use them
+LATENCY_HISTORY_SIZE: int = 500
+MIN_LATENCY_SAMPLES: int = 20
+
+_latencies: dict[str, deque] = {}
+
+
+def record_latency(name: str, seconds: float):
+    """Records the latency of a successful call to the model name - shared by all the LLMs with this name"""
+    if name not in _latencies:
+        _latencies[name] = deque(maxlen=LATENCY_HISTORY_SIZE)
+    _latencies[name].append(seconds)
+
+
+def latency_percentile(name: str, percentile: float) -> Optional[float]:
+    """Returns the percentile (0 to 100) of the latencies observed for the model name - None if not enough calls yet"""
+    values: Optional[deque] = _latencies.get(name)
+    if not values or len(values) < MIN_LATENCY_SAMPLES:
+        return None
+    ordered: list[float] = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+async def hedged_call(call: Callable[[], Awaitable[Any]], hedge_delay: float = 0.0, timeout: float = 0.0,
+                      hedge_call: Optional[Callable[[], Awaitable[Any]]] = None) -> tuple[Any, dict]:
+    """Awaits call() - if it has not returned after hedge_delay seconds (0 for no hedging), a second call is made with
+    hedge_call (call if None) and the first one to succeed is kept, the other one being cancelled
+    Raises asyncio.TimeoutError if no call succeeded after timeout seconds (0 for no timeout), the exception of the last
+    call to fail otherwise - no hedge is made if timeout comes before hedge_delay
+    Returns the result and the hedging info: hedged (bool), hedge_won (bool), latency of the call kept and latency of the
+    first call - if the hedge won, the first call is cancelled and its latency is the time it had been running, a lower
+    bound of its actual latency"""
+    start: float = time.monotonic()
+    deadline: Optional[float] = start + timeout if timeout else None
+    hedge_at: Optional[float] = start + hedge_delay if hedge_delay and (not deadline or hedge_delay < timeout) else None
+    starts: dict[asyncio.Task, float] = {}
+    first: asyncio.Task = asyncio.ensure_future(call())
+    starts[first] = start
+    pending: set[asyncio.Task] = {first}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            b_can_hedge: bool = hedge_at is not None and len(starts) == 1
+            wait_until: Optional[float] = min((t for t in (hedge_at if b_can_hedge else None, deadline) if t is not None), default=None)
+            wait: Optional[float] = max(0.0, wait_until - time.monotonic()) if wait_until is not None else None
+            done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    now: float = time.monotonic()
+                    return task.result(), {
+                        "hedged": len(starts) > 1,
+                        "hedge_won": task is not first,
+                        "latency": now - starts[task],
+                        "first_latency": now - start,
+                    }
+                error = task.exception()
+            if done:
+                continue
+            if b_can_hedge and time.monotonic() >= hedge_at:  # still running after hedge_delay: fire a second call
+                hedge: asyncio.Task = asyncio.ensure_future((hedge_call or call)())
+                starts[hedge] = time.monotonic()
+                pending.add(hedge)
+            elif deadline and time.monotonic() >= deadline:
+                raise asyncio.TimeoutError()
+        raise error  # every call failed
+    finally:
+        for task in starts:
+            if not task.done():
+                task.cancel()
@@ -5,13 +5,20 @@ from ragtime.prompters.prompter import Prompter
 from ragtime.base import RagtimeBase
 from ragtime.expe import QA, Prompt, LLMAnswer, WithLLMAnswer, StartFrom, Chunk
 from ragtime.config import logger, DEFAULT_MAX_TOKENS
+from ragtime.llms.llm_cache import LLMCache, make_cache_key, use_llm_cache
+from ragtime.llms.rate_limiter import RateLimiter, get_rate_limiter
+from ragtime.llms.single_flight import single_flight
+from ragtime.llms.tokens import count_tokens, estimate_prompt_tokens, get_usage
+from ragtime.llms.retry import RETRYABLE_EXCEPTIONS, backoff_delay, get_retry_after
+from ragtime.llms.hedging import hedged_call, latency_percentile, record_latency
 
-from litellm import completion_cost, acompletion
-from litellm.exceptions import RateLimitError
+from litellm import completion_cost, acompletion, cost_per_token
 
+from pydantic import Field, PrivateAttr
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 import asyncio
+import time
 
 
 class LLM(RagtimeBase):
@@ -20,12 +27,71 @@ class LLM(RagtimeBase):
     Class deriving from LLM must implement `complete`.
     A Prompter must be provided at creation time.
     Instantiates a get_prompt so as to be able change the prompt LLM-wise.
+    max_concurrency limits the number of simultaneous calls to `complete` made with this LLM (0 for no limit).
+    rpm and tpm are the requests and tokens per minute budgets - they are enforced by a RateLimiter shared by all
+    the LLMs with the same name, unless a specific rate_limiter is given. The tokens of a call are estimated
+    from the prompt size plus max_tokens. The budgets are consumed before each call to `complete`, unless the
+    LLM calls `acquire_rate` itself for each request actually sent (b_limits_requests).
+    If b_coalesce is True, concurrent calls with the same key (see get_cache_key) are made once and their answer is
+    shared - see SingleFlight.
     """
 
     name: Optional[str] = None
     prompter: Prompter
     max_tokens: int = DEFAULT_MAX_TOKENS
-    # _semaphore: asyncio.Semaphore = asyncio.Semaphore(1)
+    max_concurrency: int = 0
+    rpm: int = 0
+    tpm: int = 0
+    rate_limiter: Optional[RateLimiter] = None
+    b_coalesce: bool = True
+    b_limits_requests: bool = False  # True if complete calls acquire_rate for each request sent to the provider
+    _semaphore: Optional[asyncio.Semaphore] = PrivateAttr(default=None)
+    _semaphore_loop: Optional[asyncio.AbstractEventLoop] = PrivateAttr(default=None)
+
+    def _get_semaphore(self) -> Optional[asyncio.Semaphore]:
+        """Returns the semaphore limiting concurrent calls, (re)created for the running event loop"""
+        if not self.max_concurrency:
+            return None
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if not self._semaphore or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _get_rate_limiter(self) -> Optional[RateLimiter]:
+        if not self.rate_limiter and (self.rpm or self.tpm):
+            self.rate_limiter = get_rate_limiter(self.name, rpm=self.rpm, tpm=self.tpm)
+        return self.rate_limiter
+
+    def get_cache_key(self, prompt: Prompt) -> Optional[str]:
+        """Key identifying a call, used to coalesce identical calls - None if calls cannot be identified"""
+        return None
+
+    async def _complete_with_limits(self, prompt: Prompt) -> LLMAnswer:
+        """Calls `complete` within the concurrency limits and the rate limits of the LLM
+        Identical concurrent calls are made once if b_coalesce is True"""
+        key: Optional[str] = self.get_cache_key(prompt) if self.b_coalesce else None
+        if key:
+            return await single_flight.run(key, lambda: self._complete_limited(prompt))
+        return await self._complete_limited(prompt)
+
+    async def _complete_limited(self, prompt: Prompt) -> LLMAnswer:
+        semaphore: Optional[asyncio.Semaphore] = self._get_semaphore()
+        if not semaphore:
+            return await self._complete_rate_limited(prompt)
+        async with semaphore:
+            return await self._complete_rate_limited(prompt)
+
+    async def acquire_rate(self, prompt: Prompt):
+        """Waits until a request with this prompt fits in the rate limits of the LLM, then consumes it"""
+        rate_limiter: Optional[RateLimiter] = self._get_rate_limiter()
+        if rate_limiter:
+            await rate_limiter.acquire(estimate_prompt_tokens(prompt) + self.max_tokens)
+
+    async def _complete_rate_limited(self, prompt: Prompt) -> LLMAnswer:
+        if not self.b_limits_requests:
+            await self.acquire_rate(prompt)
+        return await self.complete(prompt)
 
     async def generate(
         self,
@@ -42,9 +108,6 @@ class LLM(RagtimeBase):
         If None, LLMAnswer retrieval or generation went wrong and post-processing
         must be skipped
         """
-        # await self._semaphore.acquire()
-        # logger.prefix = f"[{self.name}]"
-
         assert not prev_obj or (cur_obj.__class__ == prev_obj.__class__)
         cur_class_name: str = cur_obj.__class__.__name__
         original_logger_prefix: str = logger.prefix
@@ -57,7 +120,7 @@ class LLM(RagtimeBase):
                 or (start_from <= StartFrom.prompt and not b_missing_only):
             # logger.debug(f"Either no {cur_class_name} / LLMAnswer / Prompt exists yet, or you asked to regenerate Prompt ==> generate prompt")
             logger.debug(f"Generate prompt")
-            prompt = self.prompter.get_prompt(**kwargs)
+            prompt = self.prompter.get_prompt_for_llm(self, **kwargs)
         else:
             logger.debug(f"Reuse existing Prompt")
             prompt = prev_obj.llm_answer.prompt
@@ -72,7 +135,7 @@ class LLM(RagtimeBase):
             logger.prefix += f'[{self.name}]'
             logger.debug(f'Generate LLMAnswer with "{self.name}"')
             try:
-                result.llm_answer = await self.complete(prompt)
+                result.llm_answer = await self._complete_with_limits(prompt)
                 if result.llm_answer.chunks:
                     for chunk in result.llm_answer.chunks:
                         meta = {k: v for k, v in chunk.items() if k != 'text'}
@@ -117,38 +180,154 @@ class LiteLLM(LLM):
     The default get_prompt method is not changed.
     The generate method uses the standard litellm completion method.
     Default values of temperature (0.0)
-    Number of retries when calling the API (3) can be changed.
+    Calls failing with a transient error (rate limit, connection, timeout, server error) are retried up to
+    num_retries times, waiting with an exponential backoff with full jitter (retry_base_delay * 2^retry, capped
+    to retry_max_delay) or the delay given by the provider in the Retry-After header if longer.
+    No more retry is made once retry_deadline seconds would be exceeded (0 for no deadline).
+    The number of retries and the total waiting time are stored in LLMAnswer.meta.
+    The prompt and completion tokens are taken from the usage returned by the provider, or counted with the tokenizer
+    of the model if not returned - LLMAnswer.meta["tokens_source"] is "provider" or "tokenizer" ("estimate" if
+    no tokenizer is available for the model).
     The proper API keys and endpoints have to be specified in the keys.py module.
+    An LLMCache can be given to reuse the answers to identical prompts instead of calling the API.
+    timeout is the maximum duration in seconds of each attempt (0 for no timeout) - an attempt timing out is retried.
+    Hedging: if an attempt has not returned after hedge_after seconds, or after the hedge_percentile of the latencies
+    observed for this model once enough calls have been made, a second identical request is sent and the first answer
+    received is kept, the other request being cancelled (0 for no hedging). LLMAnswer.meta tells if the call has been
+    hedged, if the hedge won and the estimated cost of the cancelled request (its prompt tokens).
+    The rate limits are consumed by each request sent to the provider (retries and hedges included), not by the
+    answers retrieved from the cache. The answers retrieved from the cache have no cost nor duration, their original
+    ones being in LLMAnswer.meta (see llm_cache.mark_reused).
+    api_base, api_key and api_version are given to litellm to call a specific deployment, e.g. an Azure region with
+    name "azure/<deployment name>" - the LLMs with the same name and different api_base have their own rate limiter and
+    latency stats. completion_params are other parameters sent to litellm, e.g. top_p or seed.
     """
 
     name: str
+    api_base: Optional[str] = None
+    api_key: Optional[str] = Field(default=None, repr=False, exclude=True)
+    api_version: Optional[str] = None
     temperature: float = 0.0
+    completion_params: dict[str, Any] = {}
     num_retries: int = 3
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 60.0
+    retry_deadline: float = 600.0
+    cache: Optional[LLMCache] = None
+    timeout: float = 0.0
+    hedge_after: float = 0.0
+    hedge_percentile: float = 0.0
+    b_limits_requests: bool = True
+
+    def sampling_params(self) -> dict[str, Any]:
+        """Parameters of the completion other than the prompt and the connection - they change the answer"""
+        return {"temperature": self.temperature, "max_tokens": self.max_tokens, **self.completion_params}
+
+    def _connection_params(self) -> dict[str, str]:
+        params: dict[str, Optional[str]] = {"api_base": self.api_base, "api_key": self.api_key, "api_version": self.api_version}
+        return {key: value for key, value in params.items() if value}
+
+    def _deployment_key(self) -> str:
+        """Name of the model and its api_base if any - the rate limits and latencies are per deployment"""
+        return f"{self.name}@{self.api_base}" if self.api_base else self.name
+
+    def _get_rate_limiter(self) -> Optional[RateLimiter]:
+        if not self.rate_limiter and (self.rpm or self.tpm):
+            self.rate_limiter = get_rate_limiter(self._deployment_key(), rpm=self.rpm, tpm=self.tpm)
+        return self.rate_limiter
+
+    def get_cache_key(self, prompt: Prompt) -> str:
+        """Key identifying a call: model name, parameters and exact text of the prompt"""
+        return make_cache_key(model=self.name, system=prompt.system, user=prompt.user, **self.sampling_params())
+
+    def _hedge_delay(self) -> float:
+        """Delay before hedging a call - 0 for no hedging"""
+        if self.hedge_percentile:
+            observed: Optional[float] = latency_percentile(self._deployment_key(), self.hedge_percentile)
+            if observed is not None:
+                return observed
+        return self.hedge_after
+
+    def _prompt_cost(self, prompt: Prompt) -> Optional[float]:
+        """Estimated cost of the prompt tokens of a request - used for the cancelled hedged requests"""
+        try:
+            return float(cost_per_token(model=self.name, prompt_tokens=estimate_prompt_tokens(prompt), completion_tokens=0)[0])
+        except Exception:
+            return None
+
+    def _set_tokens(self, llm_answer: LLMAnswer, response, messages: list[dict]):
+        """Sets the prompt and completion tokens of the LLMAnswer from the response usage or with a tokenizer"""
+        prompt_tokens, completion_tokens = get_usage(response)
+        source: str = "provider"
+        if prompt_tokens is None or completion_tokens is None:
+            b_prompt_counted, b_completion_counted = True, True
+            if prompt_tokens is None:
+                prompt_tokens, b_prompt_counted = count_tokens(self.name, messages=messages)
+            if completion_tokens is None:
+                completion_tokens, b_completion_counted = count_tokens(self.name, text=llm_answer.text)
+            source = "tokenizer" if b_prompt_counted and b_completion_counted else "estimate"
+        llm_answer.prompt_tokens = prompt_tokens
+        llm_answer.completion_tokens = completion_tokens
+        llm_answer.meta["tokens_source"] = source
 
     async def complete(self, prompt: Prompt) -> LLMAnswer:
+        cache_key: str = self.get_cache_key(prompt) if self.cache and use_llm_cache.get() else None
+        if cache_key:
+            cached_answer: LLMAnswer = self.cache.get(cache_key)
+            if cached_answer:
+                logger.debug("LLMAnswer retrieved from cache")
+                return cached_answer
+
         messages: list[dict] = [
             {"content": prompt.system, "role": "system"},
             {"content": prompt.user, "role": "user"},
         ]
-        retry: int = 1
-        wait_step: float = 3.0
         start_ts: datetime = datetime.now()
+        start_time: float = time.monotonic()
         answer: dict = None
-        while retry < self.num_retries:
+        total_wait: float = 0.0
+        nb_retries: int = 0
+        hedging: dict = {}
+
+        def request():
+            return acompletion(
+                messages=messages,
+                model=self.name,
+                num_retries=0,  # retries are managed here
+                **self.sampling_params(),
+                **self._connection_params(),
+            )
+
+        async def hedge_request():
+            await self.acquire_rate(prompt)
+            return await request()
+
+        while True:
             try:
-                time_to_wait: float = wait_step
-                answer = await acompletion(
-                    messages=messages,
-                    model=self.name,
-                    temperature=self.temperature,
-                    num_retries=self.num_retries,
-                    max_tokens=self.max_tokens,
+                await self.acquire_rate(prompt)  # each attempt is a request sent to the provider
+                answer, hedging = await hedged_call(
+                    request,
+                    hedge_delay=self._hedge_delay(),
+                    timeout=self.timeout,
+                    hedge_call=hedge_request,
                 )
+                record_latency(self._deployment_key(), hedging["first_latency"])  # the hedge latency would hide the slow first calls
                 break
-            except RateLimitError as e:
-                logger.debug(f"Rate limit reached - will retry in {time_to_wait:.2f}s\n\t{str(e)}")
+            except RETRYABLE_EXCEPTIONS as e:
+                if nb_retries >= self.num_retries:
+                    logger.error(f"{e.__class__.__name__} - give up after {nb_retries + 1} attempts\n\t{str(e)}")
+                    return None
+                time_to_wait: float = backoff_delay(nb_retries, self.retry_base_delay, self.retry_max_delay)
+                retry_after: Optional[float] = get_retry_after(e)
+                if retry_after is not None:
+                    time_to_wait = max(time_to_wait, retry_after)
+                if self.retry_deadline and time.monotonic() - start_time + time_to_wait > self.retry_deadline:
+                    logger.error(f"{e.__class__.__name__} - give up since retrying would exceed the {self.retry_deadline}s deadline\n\t{str(e)}")
+                    return None
+                nb_retries += 1
+                logger.debug(f"{e.__class__.__name__} - retry {nb_retries}/{self.num_retries} in {time_to_wait:.2f}s\n\t{str(e)}")
                 await asyncio.sleep(time_to_wait)
-                retry += 1
+                total_wait += time_to_wait
             except Exception as e:
                 logger.exception(
                     f"The following exception occurred with prompt {prompt}"
@@ -162,7 +341,7 @@ class LiteLLM(LLM):
             text: str = answer["choices"][0]["message"]["content"]
             duration: float = (answer._response_ms /1000 if hasattr(answer, "_response_ms") else None)  # sometimes _response_ms is not present
             cost: float = float(completion_cost(answer))
-            return LLMAnswer(
+            llm_answer: LLMAnswer = LLMAnswer(
                 name=self.name,
                 full_name=full_name,
                 text=text,
@@ -170,6 +349,16 @@ class LiteLLM(LLM):
                 duration=duration,
                 cost=cost,
             )
+            self._set_tokens(llm_answer, answer, messages)
+            llm_answer.meta["retries"] = nb_retries
+            llm_answer.meta["retry_wait"] = round(total_wait, 3)
+            if hedging.get("hedged"):
+                llm_answer.meta["hedged"] = True
+                llm_answer.meta["hedge_won"] = hedging["hedge_won"]
+                llm_answer.meta["hedge_cost"] = self._prompt_cost(prompt)
+            if cache_key and llm_answer.text:
+                self.cache.put(cache_key, llm_answer)
+            return llm_answer
         except Exception as e:
             logger.debug(f"Faile to process the Answer. {e}")
         return LLMAnswer()
@@ -0,0 +1,158 @@
+from ragtime.base import RagtimeBase
+from ragtime.expe import LLMAnswer
+from ragtime.config import logger
+import ragtime.config
+
+from pydantic import PrivateAttr
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Set to False (e.g. by a TextGenerator with b_use_cache=False) to bypass the cache
+# for the LLM calls made in the current context
+use_llm_cache: ContextVar[bool] = ContextVar("use_llm_cache", default=True)
+
+
+def make_cache_key(**params) -> str:
+    """Returns a content-addressed key from the parameters of an LLM call, e.g.
+    model name, temperature, max_tokens and the system and user text of the Prompt"""
+    as_str: str = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(as_str.encode("utf-8")).hexdigest()
+
+
+def mark_reused(llm_answer: LLMAnswer, reason: str):
+    """Flags the LLMAnswer with meta[reason] (e.g. "cache_hit") as not made by its own provider call: its cost and
+    duration are set to 0 so that they do not count twice in the totals, the original ones being kept in
+    meta["original_cost"] and meta["original_duration"]"""
+    llm_answer.meta[reason] = True
+    llm_answer.meta["original_cost"] = llm_answer.cost
+    llm_answer.meta["original_duration"] = llm_answer.duration
+    llm_answer.cost = 0.0
+    llm_answer.duration = 0.0
+
+
+class LLMCache(RagtimeBase):
+    """
+    Persistent cache for LLMAnswers, stored in a SQLite file
+    Entries are keyed with make_cache_key so byte-identical calls are served from the disk
+    Eviction is done when writing:
+    - max_age (seconds): entries older than this are deleted - 0 to keep them forever
+    - max_size_mb: least recently used entries are deleted until the cache is below this size - 0 for no limit
+    hits and misses are counted since the cache object has been created
+    The same LLMCache can be shared by several LLMs
+    """
+
+    path: Optional[Path] = None
+    max_age: float = 0
+    max_size_mb: float = 0
+    hits: int = 0
+    misses: int = 0
+    _conn: Optional[sqlite3.Connection] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _size: int = PrivateAttr(default=0)
+
+    def __init__(self, path: Path = None, **kwargs):
+        """
+        Args:
+            path(Path): the SQLite file - default is DEFAULT_LLM_CACHE_PATH, i.e. "cache/llm_cache.sqlite" in the project folder
+        """
+        super().__init__(**kwargs)
+        self.path = Path(path) if path else ragtime.config.DEFAULT_LLM_CACHE_PATH
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if not self._conn:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_answers (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,
+                created REAL NOT NULL, last_access REAL NOT NULL)"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON llm_answers(last_access)")
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_answers").fetchone()[0]
+        return self._conn
+
+    def get(self, key: str) -> Optional[LLMAnswer]:
+        """Returns the cached LLMAnswer or None if not found or expired
+        The returned LLMAnswer has meta["cache_hit"] set to True and no cost nor duration (see mark_reused)"""
+        with self._lock:
+            conn: sqlite3.Connection = self._get_conn()
+            row = conn.execute("SELECT value, created FROM llm_answers WHERE key = ?", (key,)).fetchone()
+            now: float = time.time()
+            if row and self.max_age and now - row[1] > self.max_age:
+                self._delete(conn, [key])
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_answers SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        result: LLMAnswer = LLMAnswer.model_validate_json(row[0])
+        mark_reused(result, "cache_hit")
+        return result
+
+    def put(self, key: str, llm_answer: LLMAnswer):
+        """Stores the LLMAnswer and evicts old entries if needed"""
+        value: str = llm_answer.model_dump_json(exclude={"prompt"})
+        size: int = len(value.encode("utf-8"))
+        now: float = time.time()
+        with self._lock:
+            conn: sqlite3.Connection = self._get_conn()
+            old = conn.execute("SELECT size FROM llm_answers WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_answers(key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._evict(conn, now)
+            conn.commit()
+
+    def _delete(self, conn: sqlite3.Connection, keys: list[str]):
+        for key in keys:
+            row = conn.execute("SELECT size FROM llm_answers WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM llm_answers WHERE key = ?", (key,))
+                self._size -= row[0]
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if self.max_age:
+            expired: list[str] = [r[0] for r in conn.execute("SELECT key FROM llm_answers WHERE created < ?", (now - self.max_age,))]
+            self._delete(conn, expired)
+        max_size: int = int(self.max_size_mb * 1024 * 1024)
+        if max_size and self._size > max_size:
+            to_delete: list[str] = []
+            freed: int = 0
+            for key, size in conn.execute("SELECT key, size FROM llm_answers ORDER BY last_access"):
+                if self._size - freed <= max_size:
+                    break
+                to_delete.append(key)
+                freed += size
+            self._delete(conn, to_delete)
+            logger.debug(f"LLM cache: {len(to_delete)} entries evicted")
+
+    def clear(self):
+        """Removes every entry in the cache"""
+        with self._lock:
+            conn: sqlite3.Connection = self._get_conn()
+            conn.execute("DELETE FROM llm_answers")
+            conn.commit()
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Returns the number of entries, the size in bytes and the hit / miss counters"""
+        with self._lock:
+            nb_entries: int = self._get_conn().execute("SELECT COUNT(*) FROM llm_answers").fetchone()[0]
+        return {"entries": nb_entries, "size": self._size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,75 @@
+from ragtime.base import RagtimeBase
+from ragtime.config import logger
+
+from pydantic import PrivateAttr
+from typing import Optional
+import asyncio
+import time
+
+
+class RateLimiter(RagtimeBase):
+    """
+    Token bucket rate limiter enforcing a budget of requests per minute (rpm) and tokens per minute (tpm)
+    A value of 0 means no limit for the corresponding budget
+    Buckets start full and are refilled continuously, so short bursts up to the budget are allowed
+    Waiting callers are served in order, so a large request cannot be starved by smaller ones
+    """
+
+    rpm: int = 0
+    tpm: int = 0
+    _requests: float = PrivateAttr(default=None)
+    _tokens: float = PrivateAttr(default=None)
+    _last_refill: float = PrivateAttr(default=None)
+    _lock: Optional[asyncio.Lock] = PrivateAttr(default=None)
+    _lock_loop: Optional[asyncio.AbstractEventLoop] = PrivateAttr(default=None)
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if not self._lock or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self):
+        now: float = time.monotonic()
+        if self._last_refill is None:
+            self._requests, self._tokens = float(self.rpm), float(self.tpm)
+        else:
+            elapsed: float = now - self._last_refill
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+        self._last_refill = now
+
+    async def acquire(self, nb_tokens: int = 0):
+        """Waits until a request of nb_tokens tokens fits in the budgets, then consumes it"""
+        if not (self.rpm or self.tpm):
+            return
+        nb_tokens = min(nb_tokens, self.tpm)  # a request bigger than the budget waits for a full bucket
+        async with self._get_lock():
+            while True:
+                self._refill()
+                wait: float = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = (1 - self._requests) * 60 / self.rpm
+                if self.tpm and self._tokens < nb_tokens:
+                    wait = max(wait, (nb_tokens - self._tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    break
+                logger.debug(f"Rate limit - wait {wait:.2f}s")
+                await asyncio.sleep(wait)
+            self._requests -= 1
+            self._tokens -= nb_tokens
+
+
+_shared_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(name: str, rpm: int = 0, tpm: int = 0) -> RateLimiter:
+    """Returns the RateLimiter shared by all the LLMs with the same name - created with rpm and tpm if it does not exist yet"""
+    rate_limiter: RateLimiter = _shared_rate_limiters.get(name)
+    if not rate_limiter:
+        rate_limiter = RateLimiter(rpm=rpm, tpm=tpm)
+        _shared_rate_limiters[name] = rate_limiter
+    elif (rate_limiter.rpm, rate_limiter.tpm) != (rpm, tpm):
+        logger.warning(f'Rate limiter for "{name}" already exists with rpm={rate_limiter.rpm} and tpm={rate_limiter.tpm} - keep it')
+    return rate_limiter
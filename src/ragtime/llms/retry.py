@@ -0,0 +1,52 @@
+from litellm.exceptions import (
+    RateLimitError,
+    APIConnectionError,
+    Timeout,
+    ServiceUnavailableError,
+    InternalServerError,
+)
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import random
+
+# Exceptions after which a call to an LLM is worth retrying - other ones are raised or logged at once
+RETRYABLE_EXCEPTIONS: tuple = (
+    RateLimitError,
+    APIConnectionError,
+    Timeout,
+    ServiceUnavailableError,
+    InternalServerError,
+    asyncio.TimeoutError,  # per call timeout, see LiteLLM.timeout
+)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter: random delay between 0 and min(max_delay, base_delay * 2^attempt)
+    attempt starts at 0 for the first retry"""
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+def get_retry_after(exc: Exception) -> Optional[float]:
+    """Returns the delay in seconds asked by the provider in the Retry-After (or retry-after-ms) header
+    of the response attached to the exception, None if not available"""
+    headers = getattr(exc, "headers", None)
+    if not headers:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        headers = {k.lower(): v for k, v in headers.items()}
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value: str = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:  # HTTP-date format
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
@@ -0,0 +1,162 @@
+from ragtime.base import RagtimeBase
+from ragtime.expe import Prompt, LLMAnswer
+from ragtime.config import logger
+from ragtime.llms.llm import LLM, LiteLLM
+from ragtime.llms.llm_cache import make_cache_key
+
+from pydantic import PrivateAttr
+from typing import Optional
+import time
+
+CIRCUIT_CLOSED: str = "closed"
+CIRCUIT_OPEN: str = "open"
+CIRCUIT_HALF_OPEN: str = "half-open"
+
+
+class CircuitBreaker(RagtimeBase):
+    """
+    Circuit breaker of an endpoint
+    - closed: calls are sent
+    - open: after failure_threshold consecutive failures, no call is sent for cooldown seconds
+    - half-open: after the cooldown, one trial call is sent - the circuit closes if it succeeds and opens again otherwise
+    A call longer than max_latency seconds (0 for no limit) counts as a failure, even if it returns an answer
+    The latency is the exponential moving average of the durations of the successful calls
+    """
+
+    name: str = ""
+    failure_threshold: int = 3
+    cooldown: float = 30.0
+    max_latency: float = 0.0
+    state: str = CIRCUIT_CLOSED
+    calls: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    in_flight: int = 0
+    latency: Optional[float] = None
+    _opened_at: float = PrivateAttr(default=0.0)
+
+    def available(self) -> bool:
+        """True if a call can be sent - switches to half-open once the cooldown is over"""
+        if self.state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN:
+            return not self.in_flight  # a single trial call
+        return self.state == CIRCUIT_CLOSED
+
+    def record(self, duration: float, b_success: bool):
+        self.calls += 1
+        if b_success and not (self.max_latency and duration > self.max_latency):
+            self.consecutive_failures = 0
+            self.latency = duration if self.latency is None else 0.8 * self.latency + 0.2 * duration
+            if self.state != CIRCUIT_CLOSED:
+                logger.info(f'Circuit of "{self.name}" closed')
+            self.state = CIRCUIT_CLOSED
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                logger.warning(f'Circuit of "{self.name}" opened for {self.cooldown}s after {self.consecutive_failures} failures')
+            self.state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "in flight": self.in_flight,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+        }
+
+
+class RoutedLLM(LLM):
+    """
+    LLM routing the calls to several deployments (endpoints) of the same logical model, e.g. 2 Azure regions and OpenAI
+    The call is sent to the available endpoint with the fewest calls in flight, then the lowest latency - if it fails
+    (error, empty answer or call slower than max_latency) the next endpoint is tried
+    Each endpoint has a CircuitBreaker: after failure_threshold consecutive failures, it is not called for cooldown seconds
+    The endpoints whose circuit is open are not called - if every circuit is open, the endpoint with the fewest
+    consecutive failures is still tried so that the QA is not lost
+    The LLMAnswer has the name of the RoutedLLM, and the endpoint used and the number of failovers in its meta
+    Set a small num_retries on the endpoints so that the failover happens quickly
+    Each endpoint is a LiteLLM with its own connection, e.g. the same Azure deployment in 2 regions:
+    `LiteLLM(name="azure/gpt-4o", api_base="https://<resource>.openai.azure.com", api_key=..., api_version=..., prompter=...)`
+    aliases are the names of the endpoints in the logs, the meta of the LLMAnswers and health() - by default the name
+    of the endpoint, followed by "#<index>" if several endpoints have the same name
+    Call health() to get the stats of each endpoint
+    """
+
+    name: str
+    endpoints: list[LiteLLM]
+    aliases: list[str] = []
+    failure_threshold: int = 3
+    cooldown: float = 30.0
+    max_latency: float = 0.0
+    _breakers: list[CircuitBreaker] = PrivateAttr(default=None)
+
+    def alias(self, index: int) -> str:
+        """Name of the endpoint at index - see aliases"""
+        if index < len(self.aliases):
+            return self.aliases[index]
+        name: str = self.endpoints[index].name
+        return name if sum(e.name == name for e in self.endpoints) == 1 else f"{name}#{index}"
+
+    def _get_breakers(self) -> list[CircuitBreaker]:
+        if self._breakers is None:
+            self._breakers = [
+                CircuitBreaker(name=self.alias(i), failure_threshold=self.failure_threshold, cooldown=self.cooldown, max_latency=self.max_latency)
+                for i in range(len(self.endpoints))
+            ]
+        return self._breakers
+
+    def get_cache_key(self, prompt: Prompt) -> str:
+        """Same key whatever the endpoint called: the name of the RoutedLLM, the sampling parameters of the endpoints
+        and the text of the prompt"""
+        return make_cache_key(
+            model=self.name,
+            sampling=[endpoint.sampling_params() for endpoint in self.endpoints],
+            system=prompt.system,
+            user=prompt.user,
+        )
+
+    def _route(self) -> list[int]:
+        """Indexes of the endpoints in the order to try them - the available ones, or the one with the fewest
+        consecutive failures if none is available"""
+        breakers: list[CircuitBreaker] = self._get_breakers()
+        available: list[int] = [i for i, b in enumerate(breakers) if b.available()]
+        if not available:
+            return [min(range(len(breakers)), key=lambda i: breakers[i].consecutive_failures)]
+        return sorted(available, key=lambda i: (breakers[i].in_flight, breakers[i].latency or 0.0))
+
+    async def complete(self, prompt: Prompt) -> Optional[LLMAnswer]:
+        breakers: list[CircuitBreaker] = self._get_breakers()
+        route: list[int] = self._route()
+        for nb_failovers, i in enumerate(route):
+            endpoint: LiteLLM = self.endpoints[i]
+            breaker: CircuitBreaker = breakers[i]
+            breaker.in_flight += 1
+            start: float = time.monotonic()
+            llm_answer: Optional[LLMAnswer] = None
+            try:
+                llm_answer = await endpoint._complete_with_limits(prompt)
+            except Exception as e:
+                logger.warning(f'Endpoint "{self.alias(i)}" failed - {e.__class__.__name__}: {e}')
+            finally:
+                breaker.in_flight -= 1
+            b_success: bool = bool(llm_answer and llm_answer.text)
+            breaker.record(time.monotonic() - start, b_success)
+            if b_success:
+                llm_answer.meta["endpoint"] = self.alias(i)
+                llm_answer.meta["failovers"] = nb_failovers
+                llm_answer.name = self.name
+                return llm_answer
+            if nb_failovers < len(route) - 1:
+                logger.warning(f'Endpoint "{self.alias(i)}" failed - fail over to "{self.alias(route[nb_failovers + 1])}"')
+        logger.error(f'Every endpoint of "{self.name}" failed')
+        return None
+
+    def health(self) -> dict[str, dict]:
+        """Returns the state of the circuit, the number of calls and failures, the calls in flight and the latency of
+        each endpoint, per alias"""
+        return {self.alias(i): breaker.stats() for i, breaker in enumerate(self._get_breakers())}
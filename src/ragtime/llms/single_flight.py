@@ -0,0 +1,60 @@
+from ragtime.expe import LLMAnswer
+from ragtime.config import logger
+from ragtime.llms.llm_cache import mark_reused
+
+from typing import Awaitable, Callable, Optional
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call with a given key is in flight, the other calls with the same key
+    wait for its result instead of being sent again
+    Every caller gets its own copy of the LLMAnswer, with meta["coalesced"] set to True and no cost nor duration for
+    the callers which did not make the call (see mark_reused)
+    The call goes on as long as a caller waits for it - it is cancelled if every caller has been cancelled
+    calls is the number of calls actually made and hits the number of calls served by a call in flight
+    """
+
+    def __init__(self):
+        self.calls: int = 0
+        self.hits: int = 0
+        self._flights: dict[tuple[asyncio.AbstractEventLoop, str], tuple[asyncio.Task, list[int]]] = {}
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Optional[LLMAnswer]]]) -> Optional[LLMAnswer]:
+        """Returns the result of call(), or of the call in flight with the same key"""
+        flight_key: tuple = (asyncio.get_running_loop(), key)
+        flight: Optional[tuple[asyncio.Task, list[int]]] = self._flights.get(flight_key)
+        b_coalesced: bool = flight is not None
+        if b_coalesced:
+            self.hits += 1
+            logger.debug("Identical call in flight - wait for its answer")
+        else:
+            self.calls += 1
+            flight = (asyncio.ensure_future(call()), [0])
+            self._flights[flight_key] = flight
+            flight[0].add_done_callback(lambda _: self._flights.pop(flight_key, None))
+        task, waiters = flight
+        waiters[0] += 1
+        try:
+            result: Optional[LLMAnswer] = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if waiters[0] == 1 and not task.done():  # nobody else waits for the call
+                task.cancel()
+            raise
+        finally:
+            waiters[0] -= 1
+        if result is None:
+            return None
+        result = result.model_copy(deep=True)
+        if b_coalesced:
+            mark_reused(result, "coalesced")
+        return result
+
+    def stats(self) -> dict:
+        """Returns the number of calls made, of calls coalesced (hits) and of calls in flight"""
+        return {"calls": self.calls, "hits": self.hits, "in flight": len(self._flights)}
+
+
+# Shared by all the LLMs - the keys contain the model name and parameters
+single_flight: SingleFlight = SingleFlight()
@@ -0,0 +1,72 @@
+from ragtime.expe import Prompt
+
+from functools import lru_cache
+from typing import Any, Optional
+import hashlib
+
+# empirically 1 token is between 4 and 5 chars - keep the smallest value so that estimates are upper bounds
+CHARS_PER_TOKEN: int = 4
+# number of token counts kept by cached_count_tokens - the oldest ones are removed first
+TOKEN_COUNTS_CACHE_SIZE: int = 100_000
+
+_token_counts: dict[tuple[str, bytes], int] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast estimation of the number of tokens in a text, without a tokenizer"""
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+def estimate_prompt_tokens(prompt: Prompt) -> int:
+    """Estimated number of tokens sent to the LLM for a Prompt (system + user)"""
+    return estimate_tokens(prompt.system) + estimate_tokens(prompt.user)
+
+
+def get_usage(response: Any) -> tuple[Optional[int], Optional[int]]:
+    """Returns the prompt and completion tokens in the usage of a completion response, None if not given"""
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def count_tokens(model: str, text: str = "", messages: Optional[list[dict]] = None) -> tuple[int, bool]:
+    """Number of tokens of the text or of the messages with the tokenizer of the model (litellm.token_counter)
+    Returns the number and True if it has been counted with a tokenizer, False if it has been estimated"""
+    try:
+        from litellm import token_counter
+
+        return (token_counter(model=model, messages=messages) if messages else token_counter(model=model, text=text or "")), True
+    except Exception:
+        if messages:
+            return sum(estimate_tokens(m.get("content") or "") for m in messages), False
+        return estimate_tokens(text), False
+
+
+def cached_count_tokens(model: str, text: str) -> int:
+    """count_tokens for a text, cached - used for the texts sent many times, e.g. the chunks
+    The counts are cached with a hash of the text, so that the texts themselves are not kept in memory"""
+    key: tuple[str, bytes] = (model, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    count: Optional[int] = _token_counts.get(key)
+    if count is None:
+        count = count_tokens(model, text=text)[0]
+        if len(_token_counts) >= TOKEN_COUNTS_CACHE_SIZE:
+            del _token_counts[next(iter(_token_counts))]
+        _token_counts[key] = count
+    return count
+
+
+@lru_cache(maxsize=None)
+def context_window(model: str) -> Optional[int]:
+    """Maximum number of input tokens of the model as known by litellm, None if unknown - cached"""
+    try:
+        from litellm import get_model_info
+
+        info: dict = get_model_info(model)
+        return info.get("max_input_tokens") or info.get("max_tokens")
+    except Exception:
+        return None
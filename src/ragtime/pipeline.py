@@ -17,6 +17,9 @@ from ragtime.config import (
 from pathlib import Path
 from typing import Union
 
+# Parameters of a step given to its generator, e.g. {"max_concurrency": 5, "b_use_cache": False}
+GENERATOR_PARAMS: tuple[str, ...] = ("max_concurrency", "wait_between_calls", "b_use_cache")
+
 
 def LLMs_from_names(names: list[str], prompter: Prompter) -> list[LLM]:
     """
@@ -51,18 +54,18 @@ def run_pipeline(
     generator_table: dict[str, dict] = {
         "answers": {
             "generator": (
-                lambda llms, retriever: AnsGenerator(
-                    llms=llms, retriever=retriever
+                lambda llms, retriever, params: AnsGenerator(
+                    llms=llms, retriever=retriever, **params
                 ).generate
             ),
             "default_output_folder": FOLDER_ANSWERS,
         },
         "facts": {
-            "generator": (lambda llms, retriever: FactGenerator(llms=llms).generate),
+            "generator": (lambda llms, retriever, params: FactGenerator(llms=llms, **params).generate),
             "default_output_folder": FOLDER_FACTS,
         },
         "evals": {
-            "generator": (lambda llms, retriever: EvalGenerator(llms=llms).generate),
+            "generator": (lambda llms, retriever, params: EvalGenerator(llms=llms, **params).generate),
             "default_output_folder": FOLDER_EVALS,
         },
     }
@@ -109,8 +112,9 @@ def run_pipeline(
             retriever = configuration.get("retriever", None)
 
         # Instanciate the Exporter and start the generation
+        params: dict = {key: step_conf[key] for key in GENERATOR_PARAMS if key in step_conf}
         expe: Expe = Expe(json_path=input_folder / file_name)
-        generator["generator"](llms, retriever)(
+        generator["generator"](llms, retriever, params)(
             expe,
             only_llms=step_conf.get("only_llms", None),
             save_every=step_conf.get("save_every", 0),
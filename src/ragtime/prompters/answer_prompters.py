@@ -1,7 +1,9 @@
 from typing import Optional
-from ragtime.expe import QA, Prompt, Question, Chunks, Answer
+from ragtime.expe import QA, Prompt, Question, Chunk, Chunks, Answer
 from ragtime.prompters import Prompter
 from ragtime.config import logger
+from ragtime.llms.tokens import cached_count_tokens, context_window, count_tokens
+from enum import IntEnum
 import markdown
 from langdetect import detect
 import json
@@ -27,18 +29,55 @@ class AnsPrompterBase(Prompter):
         """
         cur_obj.text = markdown.markdown(cur_obj.llm_answer.text)
 
+class BudgetPolicy(IntEnum):
+    """How the chunks are fitted in the context window of the LLM - the chunks are in their retrieval rank order
+    - rank_order: every chunk fitting in the remaining budget is kept, the ones too long are skipped
+    - truncate_tail: the chunks are kept until the budget is reached, the last one being truncated to fill it
+    - drop_lowest: the lowest ranked chunks are dropped until the remaining ones fit"""
+
+    rank_order = 0
+    truncate_tail = 1
+    drop_lowest = 2
+
+
+def fit_chunks(sizes: list[int], budget: int, policy: BudgetPolicy) -> tuple[list[int], Optional[int], int]:
+    """Returns the indexes of the chunks to keep given their sizes in tokens, the index of the chunk to truncate if any
+    and the number of tokens left for it"""
+    kept: list[int] = []
+    used: int = 0
+    for i, size in enumerate(sizes):
+        if used + size <= budget:
+            kept.append(i)
+            used += size
+        elif policy == BudgetPolicy.rank_order:
+            continue
+        elif policy == BudgetPolicy.truncate_tail and budget - used > 0:
+            return kept, i, budget - used
+        else:
+            break
+    return kept, None, 0
+
+
 class AnsPrompterWithRetrieverFR(Prompter):
     """
     This new prompter is supposed to generate shorter answers than the one from 2024-06-04
     This prompter uses a prompt asking the LLM to generate a JSON structure
     and includes chunks in its prompt. It performs post-processing to exploit
     the JSON structure the LLM is supposed to generate.
+    The chunks are fitted in the context window of the LLM minus its max_tokens according to budget_policy - the context
+    window is taken from context_windows, from litellm, or is default_context_window (0 to never limit the chunks) if
+    the model is unknown - what has been dropped is stored in Answer.meta["context_budget"]
     """
 
     FLD_QUEST_OK: str = "q_ok"
     FLD_CHUNKS_OK: str = "chunks_ok"
     FLD_ANSWER: str = "answer"
 
+    budget_policy: BudgetPolicy = BudgetPolicy.drop_lowest
+    context_windows: dict[str, int] = {}
+    default_context_window: int = 0
+    budget_margin: int = 32  # tokens kept for the formatting of the messages
+
     system:str = f"""
 Tu es un expert qui doit répondre à des questions à l'aide de paragraphes qui te sont fournis.
 Ta réponse doit être au format JSON suivant :
@@ -51,15 +90,22 @@ Les paragraphes sont présentés ainsi :
 Contenu
     """
 
+    def chunk_to_str(self, chunk: Chunk) -> str:
+        """Converts a chunk into a string for the prompt"""
+        # Format string to convert a chunk into a string
+        fmt_chunk_to_str: str = """- {title} (p. {page})
+        {text}"""
+        return fmt_chunk_to_str.format(
+            title=chunk.meta["display_name"],
+            page=chunk.meta["page_number"],
+            text=chunk.text,
+        )
+
     def get_prompt(self, question: Question, chunks: Optional[Chunks] = None) -> Prompt:
         """
         This Answer prompt asks for a JSON answer
         """
 
-        # Format string to convert a chunk into a string
-        fmt_chunk_to_str: str = """- {title} (p. {page})
-        {text}"""
-
         # Format string to join the strings representing the different chunks
         str_joint: str = "\n\n"
 
@@ -75,14 +121,7 @@ Contenu
 
         result: Prompt = Prompt()
         # Compute the user prompt
-        chunks_as_list: list[str] = [
-            fmt_chunk_to_str.format(
-                title=chunk.meta["display_name"],
-                page=chunk.meta["page_number"],
-                text=chunk.text,
-            )
-            for chunk in chunks
-        ]
+        chunks_as_list: list[str] = [self.chunk_to_str(chunk) for chunk in chunks]
         chunks_as_str: str = str_joint.join(chunks_as_list)
         result.user = fmt_chunks_to_user_msg.format(
             chunks=chunks_as_str, question=question.text
@@ -93,6 +132,54 @@ Contenu
 
         return result
 
+    def get_prompt_for_llm(self, llm, question: Question, chunks: Optional[Chunks] = None) -> Prompt:
+        """
+        Returns the prompt with the chunks fitting in the context window of the LLM minus its max_tokens
+        The number of tokens of each chunk is computed once with the tokenizer of the LLM and cached
+        The budget, the chunks dropped and the chunk truncated are stored in Prompt.meta["context_budget"]
+        """
+        window: int = self.context_windows.get(llm.name) or context_window(llm.name) or self.default_context_window
+        if not chunks or not window:
+            return self.get_prompt(question=question, chunks=chunks)
+        fixed: Prompt = self.get_prompt(question=question, chunks=Chunks())
+        budget: int = (window - llm.max_tokens - self.budget_margin
+                       - count_tokens(llm.name, text=fixed.system)[0] - count_tokens(llm.name, text=fixed.user)[0])
+        chunks_as_str: list[str] = [self.chunk_to_str(chunk) for chunk in chunks]
+        sizes: list[int] = [cached_count_tokens(llm.name, c) + 1 for c in chunks_as_str]  # + 1 for the separator
+        kept, truncated, truncated_budget = fit_chunks(sizes, max(budget, 0), self.budget_policy)
+        prompt_chunks: list[Chunk] = [chunks[i] for i in kept]
+        chunks_tokens: int = sum(sizes[i] for i in kept)
+        truncated_chunk, truncated_size = self._truncate(llm.name, chunks[truncated], truncated_budget) if truncated is not None else (None, 0)
+        if truncated_chunk:
+            prompt_chunks.append(truncated_chunk)
+            chunks_tokens += truncated_size
+        else:  # nothing of the chunk fits - it is dropped
+            truncated = None
+        result: Prompt = self.get_prompt(question=question, chunks=Chunks(items=prompt_chunks))
+        result.meta["context_budget"] = {
+            "policy": self.budget_policy.name,
+            "budget": budget,
+            "chunks tokens": chunks_tokens,
+            "dropped": [i for i in range(len(chunks)) if i not in kept and i != truncated],
+            "truncated": truncated,
+        }
+        if len(kept) < len(chunks):
+            logger.debug(f'Context budget of {budget} tokens for "{llm.name}" - {len(chunks) - len(kept)} chunk(s) dropped or truncated')
+        return result
+
+    def _truncate(self, model: str, chunk: Chunk, budget: int) -> tuple[Optional[Chunk], int]:
+        """Returns a copy of the chunk with its text cut so that the chunk fits in budget tokens and its number of
+        tokens - None if no text fits
+        The prefixes tried are counted without the cache since they are not sent again"""
+        text: str = chunk.text
+        size: int = 0
+        while text:
+            size = count_tokens(model, text=self.chunk_to_str(Chunk(text=text, meta=chunk.meta)))[0] + 1
+            if size <= budget:
+                break
+            text = text[: int(len(text) * budget / size * 0.95)]
+        return (Chunk(text=text, meta=chunk.meta), size) if text.strip() else (None, 0)
+
     def post_process(self, qa: QA, cur_obj: Answer):
         """
         Do JSON post processing (i.e. tries to extract correct JSON in an incorrect
@@ -134,6 +221,8 @@ Contenu
             )
             return
         cur_obj.text = cur_obj.llm_answer.text
+        if cur_obj.llm_answer.prompt and "context_budget" in cur_obj.llm_answer.prompt.meta:
+            cur_obj.meta["context_budget"] = cur_obj.llm_answer.prompt.meta["context_budget"]
         try:
             json_ans: dict = json.loads(cur_obj.text)
             json_ok = True
@@ -171,15 +260,18 @@ Contenu
             cur_obj.meta["lang"] = None
 
         # Calc nb sources in answer even if the JSON is not formatted well
+        # only the chunks in the prompt, i.e. not dropped to fit in the context window, can be quoted
+        dropped: set[int] = set(cur_obj.meta.get("context_budget", {}).get("dropped", []))
+        prompt_chunks: list[Chunk] = [c for i, c in enumerate(qa.chunks) if i not in dropped]
         ans_formatted: str = fmt_name(cur_obj.llm_answer.text)
         docs_in_chunks: dict[str, str] = {
-            c.meta["display_name"]: fmt_name(c.meta["display_name"]) for c in qa.chunks
+            c.meta["display_name"]: fmt_name(c.meta["display_name"]) for c in prompt_chunks
         }
         docs_page_in_chunks: dict[str] = {
             f'{c.meta["display_name"]} p.{c.meta["page_number"]}': fmt_name(
                 f'{c.meta["display_name"]}p.{c.meta["page_number"]}'
             )
-            for c in qa.chunks
+            for c in prompt_chunks
         }
         cur_obj.meta["docs_in_ans"] = [
             orig_name
@@ -13,14 +13,19 @@ class Prompter(RagtimeBase, ABC):
     system:str = ""
     name:str = ""
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self.name = self.__class__.__name__
 
     @abstractmethod
     def get_prompt(self) -> Prompt:
         raise NotImplementedError("Must implement this!")
 
+    def get_prompt_for_llm(self, llm, **kwargs) -> Prompt:
+        """Returns the prompt for the LLM which will be called with it - the prompt does not depend on the LLM by default
+        Can be overridden to adapt the prompt to the LLM, e.g. to its context window"""
+        return self.get_prompt(**kwargs)
+
     @abstractmethod
     def post_process(self, qa: QA, cur_obj: WithLLMAnswer) -> WithLLMAnswer:
         raise NotImplementedError("Must implement this!")